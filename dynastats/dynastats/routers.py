@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import time
+
+from django.conf import settings
+
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+# reads inside the block go to alias, writes always go to the primary
+@contextmanager
+def read_from(alias: str):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter():
+    # Reads go to the alias chosen with read_from, everything else (tasks, writes, migrations) to default.
+    # Without a replica configured every query stays on default.
+    def db_for_read(self, model, **hints) -> str:
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints) -> str:
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool:
+        return db == 'default'
+
+
+# a session that just imported a league reads from the primary for a while so it sees its own writes
+def pin_to_primary(request, seconds: int=None) -> None:
+    request.session['read_primary_until'] = time() + (seconds or settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(request) -> bool:
+    return request.session.get('read_primary_until', 0) > time()
+
+
+class ReplicaReadMixin():
+    # Serves a view's reads from the replica, put it after LoginRequiredMixin so the session and user
+    # lookups stay on the primary
+    read_alias = 'replica'
+
+    def dispatch(self, request, *args, **kwargs):
+        alias = self.read_alias if self.read_alias in settings.DATABASES and not is_pinned(request) else 'default'
+        with read_from(alias):
+            return super().dispatch(request, *args, **kwargs)
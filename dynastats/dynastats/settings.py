@@ -89,6 +89,24 @@ DATABASES = {
     }
 }
 
+# optional read replica or snapshot the web views read from, tasks always use default
+# unset keys are taken from default, so a SQLite snapshot only needs REPLICA_DB_NAME
+REPLICA_DB_NAME = config('REPLICA_DB_NAME', default='')
+if REPLICA_DB_NAME:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'ENGINE': config('REPLICA_DB_ENGINE', default=DATABASES['default']['ENGINE']),
+        'NAME': REPLICA_DB_NAME,
+        'HOST': config('REPLICA_DB_HOST', default=''),
+        'PORT': config('REPLICA_DB_PORT', default=''),
+        'USER': config('REPLICA_DB_USER', default=''),
+        'PASSWORD': config('REPLICA_DB_PASSWORD', default=''),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['dynastats.routers.ReplicaRouter']
+# seconds a session reads from default after its import finished, so it sees the league it just imported
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=300, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -148,4 +166,71 @@ CELERY_RESULT_BACKEND = 'django-db'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_RESULT_EXPIRES = timedelta(days=1)
-CELERY_WORKER_HIJACK_ROOT_LOGGER = False
\ No newline at end of file
+CELERY_WORKER_HIJACK_ROOT_LOGGER = False
+
+# Sleeper API config
+# number of weeks fetched in parallel by SleeperAPI.get_season_* methods
+SLEEPER_API_CONCURRENCY = config('SLEEPER_API_CONCURRENCY', default=1, cast=int)
+# connection pool of the session each worker process shares between its SleeperAPI instances, pool_maxsize
+# should cover SLEEPER_API_CONCURRENCY twice over when requests are hedged
+SLEEPER_POOL_CONNECTIONS = config('SLEEPER_POOL_CONNECTIONS', default=2, cast=int)
+SLEEPER_POOL_MAXSIZE = config('SLEEPER_POOL_MAXSIZE', default=max(10, 2 * SLEEPER_API_CONCURRENCY), cast=int)
+# requests per minute shared by every SleeperAPI instance through the database, Sleeper asks for less than 1000
+# the bucket holds at most SLEEPER_RATE_BURST tokens, so no 60 second window can exceed SLEEPER_RATE_LIMIT + SLEEPER_RATE_BURST
+SLEEPER_RATE_LIMIT = config('SLEEPER_RATE_LIMIT', default=900, cast=int)
+SLEEPER_RATE_BURST = config('SLEEPER_RATE_BURST', default=50, cast=int)
+# bucket shared by the workers of a host when PERSISTENCE_MODE is 'queue' or the database is sqlite, every host
+# gets its own budget
+SLEEPER_RATE_BUCKET_PATH = config('SLEEPER_RATE_BUCKET_PATH', default=str(BASE_DIR / 'sleeper_rate_bucket'))
+# on-disk cache of Sleeper responses, set SLEEPER_CACHE_PATH to an empty string to disable it
+# past seasons are kept until evicted, the current season for SLEEPER_CACHE_TTL seconds
+SLEEPER_CACHE_PATH = config('SLEEPER_CACHE_PATH', default=str(BASE_DIR / 'api_cache.sqlite3'))
+SLEEPER_CACHE_MAX_SIZE = config('SLEEPER_CACHE_MAX_SIZE', default=512 * 1024 * 1024, cast=int)
+SLEEPER_CACHE_TTL = config('SLEEPER_CACHE_TTL', default=300, cast=int)
+SLEEPER_CACHE_STATE_TTL = config('SLEEPER_CACHE_STATE_TTL', default=60, cast=int)
+# seconds each process keeps /state/nfl in memory before asking the API again
+SLEEPER_NFL_STATE_TTL = config('SLEEPER_NFL_STATE_TTL', default=300, cast=int)
+# seconds to wait for a connection and for a response, SLEEPER_ENDPOINT_TIMEOUTS overrides the response timeout
+# of slow endpoints, keyed by main.archive.endpoint_name
+SLEEPER_CONNECT_TIMEOUT = config('SLEEPER_CONNECT_TIMEOUT', default=5, cast=float)
+SLEEPER_READ_TIMEOUT = config('SLEEPER_READ_TIMEOUT', default=15, cast=float)
+SLEEPER_ENDPOINT_TIMEOUTS = {
+    'players_nfl': 120,
+}
+# sends a second request when one takes longer than the SLEEPER_HEDGE_PERCENTILE latency of its endpoint,
+# hedges use the rate limit like any other request
+SLEEPER_HEDGE_REQUESTS = config('SLEEPER_HEDGE_REQUESTS', default=False, cast=bool)
+SLEEPER_HEDGE_PERCENTILE = config('SLEEPER_HEDGE_PERCENTILE', default=95, cast=float)
+# directory every raw response is archived to for offline re-imports with replay_import, empty to disable
+SLEEPER_ARCHIVE_PATH = config('SLEEPER_ARCHIVE_PATH', default=str(BASE_DIR / 'archive'))
+
+# Import config
+# number of players formatted and saved at a time by update_players
+PLAYERS_BATCH_SIZE = config('PLAYERS_BATCH_SIZE', default=1000, cast=int)
+# update_players writes the ids of the players it changed here, processes patch their search index from it
+PLAYER_INDEX_STAMP_PATH = config('PLAYER_INDEX_STAMP_PATH', default=str(BASE_DIR / 'player_index.stamp'))
+# number of formatted objects import_league holds before saving them
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=1000, cast=int)
+# reports the peak memory of every import_league in its result, traces allocations so it slows imports down
+IMPORT_TRACE_MEMORY = config('IMPORT_TRACE_MEMORY', default=False, cast=bool)
+# seconds the checkpoints of a failed import_league are resumed from before the league is fetched again
+IMPORT_CHECKPOINT_MAX_AGE = config('IMPORT_CHECKPOINT_MAX_AGE', default=24 * 60 * 60, cast=int)
+# retry_league_import splits failed leagues over at most RETRY_CONCURRENCY parallel subtasks
+# a league that fails again waits RETRY_BACKOFF_BASE seconds, doubled after every failure up to RETRY_BACKOFF_MAX
+RETRY_CONCURRENCY = config('RETRY_CONCURRENCY', default=8, cast=int)
+RETRY_BACKOFF_BASE = config('RETRY_BACKOFF_BASE', default=10 * 60, cast=int)
+RETRY_BACKOFF_MAX = config('RETRY_BACKOFF_MAX', default=7 * 24 * 60 * 60, cast=int)
+# seconds a dispatched league is not retried again, in case its subtask dies without recording the outcome
+RETRY_LEASE_SECONDS = config('RETRY_LEASE_SECONDS', default=2 * 60 * 60, cast=int)
+# 'direct' saves imports from every worker, 'queue' hands formatted batches to a single run_writer process
+# through PERSISTENCE_QUEUE_PATH so only one process writes import data, for SQLite deployments
+PERSISTENCE_MODE = config('PERSISTENCE_MODE', default='direct')
+PERSISTENCE_QUEUE_PATH = config('PERSISTENCE_QUEUE_PATH', default=str(BASE_DIR / 'write_queue'))
+# number of queued objects the writer commits per transaction
+PERSISTENCE_WRITER_BATCH_SIZE = config('PERSISTENCE_WRITER_BATCH_SIZE', default=5000, cast=int)
+# number of users each crawl_users subtask of crawl_leagues handles
+CRAWL_CHUNK_SIZE = config('CRAWL_CHUNK_SIZE', default=25, cast=int)
+# seconds a crawl worker holds its users before another worker may take them over, renewed after every user
+CRAWL_LEASE_SECONDS = config('CRAWL_LEASE_SECONDS', default=1800, cast=int)
+# seconds after which crawl_leagues removes league claims left by runs that never finished, longer than any run
+CRAWL_CLAIM_MAX_AGE = config('CRAWL_CLAIM_MAX_AGE', default=24 * 60 * 60, cast=int)
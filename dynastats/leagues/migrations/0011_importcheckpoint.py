@@ -0,0 +1,27 @@
+# Generated by Django 4.1 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0010_alter_league_last_import_successful'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('league_id', models.CharField(max_length=80)),
+                ('stage', models.CharField(max_length=80)),
+                ('payload', models.TextField(null=True)),
+                ('persisted', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('league_id', 'stage'), name='unique_import_checkpoint')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0011_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='league',
+            name='import_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='league',
+            name='last_import_error',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='league',
+            name='next_retry_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0012_league_import_retries'),
+        ('main', '0017_sleeperuser_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='league',
+            index=models.Index(fields=['last_import_successful', 'next_retry_at'], name='league_retry_due'),
+        ),
+    ]
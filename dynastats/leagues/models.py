@@ -23,7 +23,28 @@ class League(models.Model):
     avatar = models.CharField(max_length=80, null=True)
     sleeper_users = models.ManyToManyField(SleeperUser)
     last_import_successful = models.BooleanField(default=False)
+    import_attempts = models.PositiveSmallIntegerField(default=0)  # failed imports since the last successful one
+    last_import_error = models.TextField(null=True)
+    next_retry_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_import_successful', 'next_retry_at'], name='league_retry_due'),
+        ]
 
     def __str__(self):
         return self.league_id
-    
\ No newline at end of file
+    
+
+# resource stages of a failed import_league, see main.checkpoint.LeagueCheckpoint
+class ImportCheckpoint(models.Model):
+    league_id = models.CharField(max_length=80)
+    stage = models.CharField(max_length=80)
+    payload = models.TextField(null=True)  # JSON text of the stage's responses, null once persisted
+    persisted = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['league_id', 'stage'], name='unique_import_checkpoint'),
+        ]
@@ -2,10 +2,11 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import render
 from django.views.generic import TemplateView
 
+from dynastats.routers import ReplicaReadMixin
 from leagues.models import League
 
 # Create your views here.
-class LeaguesList(LoginRequiredMixin, TemplateView):
+class LeaguesList(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
     template = 'leagues/leagues_list.html'
 
     def get(self, request):
@@ -17,7 +18,7 @@ class LeaguesList(LoginRequiredMixin, TemplateView):
         return render(request, self.template, context=context)
 
 
-class LeagueInfo(LoginRequiredMixin, TemplateView):
+class LeagueInfo(LoginRequiredMixin, ReplicaReadMixin, TemplateView):
     template = 'leagues/league_info.html'
     def get(self, request, league_id):
         league = League.objects.get(league_id=league_id)
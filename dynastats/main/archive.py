@@ -0,0 +1,143 @@
+from collections import OrderedDict
+import gzip
+import json
+import os
+import socket
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Iterator
+from urllib.parse import urlparse
+
+
+# endpoint names are the non numeric parts of the path, /v1/league/123/matchups/4 -> league_matchups
+def endpoint_name(url: str) -> str:
+    segments = urlparse(url).path.strip('/').split('/')[1:]
+    return '_'.join(segment for segment in segments if not segment.isdigit()) or 'root'
+
+
+class PayloadArchive():
+    # Append-only archive of every raw Sleeper response, stored as gzipped JSON Lines segments under
+    # <path>/<endpoint>/<date>-<host>-<pid>.jsonl.gz so processes never write to the same file. Records are
+    # buffered and appended as a new gzip member every flush_size records, a crash loses at most that many.
+    # Writers share one archive per process (see process_archive) that is flushed after every task.
+    def __init__(self, path: str, flush_size: int=100, max_open_segments: int=16) -> None:
+        self._path = Path(path)
+        self._flush_size = flush_size
+        self._max_open_segments = max_open_segments
+        self._lock = Lock()
+        self._buffers = {}
+        self._index = None
+        self._open_segments = OrderedDict()
+
+    def _segment(self, endpoint: str, fetched: float) -> Path:
+        date = datetime.utcfromtimestamp(fetched).strftime('%Y-%m-%d')
+        return self._path / endpoint / f'{date}-{socket.gethostname()}-{os.getpid()}.jsonl.gz'
+
+    def write(self, url: str, body: bytes) -> None:
+        fetched = time()
+        endpoint = endpoint_name(url)
+        record = {'url': url, 'endpoint': endpoint, 'fetched': fetched, 'body': body.decode('utf-8')}
+        line = json.dumps(record) + '\n'
+        segment = self._segment(endpoint, fetched)
+        with self._lock:
+            buffer = self._buffers.setdefault(segment, [])
+            buffer.append(line)
+            if len(buffer) >= self._flush_size:
+                self._write_segment(segment, self._buffers.pop(segment))
+
+    def _write_segment(self, segment: Path, lines: list) -> None:
+        segment.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(segment, 'at', encoding='utf-8') as f:
+            f.writelines(lines)
+
+    def flush(self) -> None:
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            for segment, lines in buffers.items():
+                self._write_segment(segment, lines)
+
+    def segments(self, endpoint: str=None) -> 'list[Path]':
+        pattern = f'{endpoint}/*.jsonl.gz' if endpoint else '*/*.jsonl.gz'
+        return sorted(self._path.glob(pattern))
+
+    # (offset, line) of the records of a segment, offsets into the uncompressed data. A segment cut short by a
+    # crash is read up to its last complete record.
+    def _iter_lines(self, segment: Path) -> Iterator[tuple]:
+        with gzip.open(segment, 'rb') as f:
+            try:
+                while True:
+                    offset = f.tell()
+                    line = f.readline()
+                    if not line.endswith(b'\n'):
+                        return
+                    yield offset, line
+            except (EOFError, gzip.BadGzipFile):
+                return
+
+    def iter_records(self, endpoint: str=None) -> Iterator[dict]:
+        for segment in self.segments(endpoint):
+            for _, line in self._iter_lines(segment):
+                yield json.loads(line)
+
+    # where the latest record of each url is, bodies are only read when they are asked for so a replay of the
+    # whole archive is not bound by memory
+    def index(self) -> dict:
+        if self._index is None:
+            self.flush()
+            index = {}
+            for segment in self.segments():
+                for offset, line in self._iter_lines(segment):
+                    record = json.loads(line)
+                    url = record['url']
+                    if url not in index or record['fetched'] >= index[url][2]:
+                        index[url] = (segment, offset, record['fetched'])
+            self._index = index
+        return self._index
+
+    # segments stay open between reads, replays mostly read forward through them which gzip does without
+    # decompressing from the start
+    def _open(self, segment: Path) -> gzip.GzipFile:
+        if segment in self._open_segments:
+            self._open_segments.move_to_end(segment)
+        else:
+            self._open_segments[segment] = gzip.open(segment, 'rb')
+            if len(self._open_segments) > self._max_open_segments:
+                self._open_segments.popitem(last=False)[1].close()
+        return self._open_segments[segment]
+
+    def get(self, url: str) -> bytes:
+        location = self.index().get(url)
+        if location is None:
+            return None
+        segment, offset, _ = location
+        with self._lock:
+            f = self._open(segment)
+            f.seek(offset)
+            return json.loads(f.readline())['body'].encode('utf-8')
+
+
+_process_archives = {}
+_process_archives_lock = Lock()
+
+
+# The archive every SleeperAPI of the process writes to. Archives are keyed by pid, a forked worker starts its
+# own instead of writing out the records its parent had buffered.
+def process_archive(path: str) -> PayloadArchive:
+    global _process_archives
+    key = (os.getpid(), str(path))
+    with _process_archives_lock:
+        if key not in _process_archives:
+            _process_archives = {k: archive for k, archive in _process_archives.items() if k[0] == key[0]}
+            _process_archives[key] = PayloadArchive(path)
+        return _process_archives[key]
+
+
+# writes out the records buffered by this process, Celery workers call it after every task since their
+# processes exit without running any cleanup
+def flush_process_archives() -> None:
+    with _process_archives_lock:
+        archives = [archive for (pid, _), archive in _process_archives.items() if pid == os.getpid()]
+    for archive in archives:
+        archive.flush()
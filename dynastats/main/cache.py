@@ -0,0 +1,105 @@
+import sqlite3
+from contextlib import contextmanager
+from threading import Lock
+from time import time
+
+
+class ResponseCache():
+    # On-disk cache of response bodies keyed by url, stored in its own sqlite file so it can be shared by every
+    # worker on a host. Entries past their ttl are dropped on read, least recently used entries are evicted
+    # once the stored bodies exceed max_size bytes. Their total is kept in the metadata table, updated in the
+    # transaction of every insert and delete so eviction never has to sum the table.
+    FOREVER = None
+    DISABLED = 0
+
+    def __init__(self, path: str, max_size: int) -> None:
+        self._path = str(path)
+        self._max_size = max_size
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(url TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, expires REAL, accessed REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+            conn.execute('CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            # caches created before the running total are summed once
+            conn.execute(
+                "INSERT OR IGNORE INTO metadata (key, value) SELECT 'size', COALESCE(SUM(size), 0) FROM responses"
+            )
+
+    # a connection per operation keeps the cache usable from SleeperAPI's worker threads
+    @contextmanager
+    def _connection(self):
+        conn = sqlite3.connect(self._path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, url: str) -> bytes:
+        now = time()
+        with self._connection() as conn:
+            row = conn.execute('SELECT body, expires FROM responses WHERE url = ?', (url,)).fetchone()
+            if row is not None and row[1] is not None and row[1] < now:
+                self._delete(conn, [url])
+                row = None
+            if row is not None:
+                conn.execute('UPDATE responses SET accessed = ? WHERE url = ?', (now, url))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row and row[0]
+
+    def set(self, url: str, body: bytes, ttl: int=FOREVER) -> None:
+        now = time()
+        expires = None if ttl is self.FOREVER else now + ttl
+        with self._connection() as conn:
+            # the write lock is taken up front, the size of the replaced entry must not change before the insert
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                "UPDATE metadata SET value = value + ? - COALESCE((SELECT size FROM responses WHERE url = ?), 0) "
+                "WHERE key = 'size'",
+                (len(body), url)
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (url, body, size, expires, accessed) VALUES (?, ?, ?, ?, ?)',
+                (url, body, len(body), expires, now)
+            )
+            self._evict(conn)
+
+    def _delete(self, conn: sqlite3.Connection, urls: list) -> None:
+        conn.executemany(
+            "UPDATE metadata SET value = value - COALESCE((SELECT size FROM responses WHERE url = ?), 0) "
+            "WHERE key = 'size'",
+            [(url,) for url in urls]
+        )
+        conn.executemany('DELETE FROM responses WHERE url = ?', [(url,) for url in urls])
+
+    def _size(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT value FROM metadata WHERE key = 'size'").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total_size = self._size(conn)
+        if total_size <= self._max_size:
+            return
+        excess = total_size - self._max_size
+        evicted = []
+        for url, size in conn.execute('SELECT url, size FROM responses ORDER BY accessed'):
+            evicted.append(url)
+            excess -= size
+            if excess <= 0:
+                break
+        self._delete(conn, evicted)
+
+    def stats(self) -> dict:
+        with self._connection() as conn:
+            entries = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            size = self._size(conn)
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'size': size}
@@ -0,0 +1,94 @@
+import json
+from datetime import timedelta
+from typing import Callable, Iterator
+
+from django.utils import timezone
+
+from leagues.models import ImportCheckpoint
+
+
+class LeagueCheckpoint():
+    # Tracks the resource stages of one import_league run (the league's users and rosters, each week of
+    # transactions and matchups, each draft) as they are fetched and persisted. Checkpoints are only written
+    # when an import fails, the next attempt then skips persisted stages and reuses the stored payloads of
+    # fetched ones. Checkpoints older than max_age seconds are discarded since the data may have changed.
+    def __init__(self, league_id: str, api, max_age: int) -> None:
+        self.league_id = league_id
+        self._api = api
+        self._payloads = {}  # JSON text of fetched stages until they are persisted, Formatter modifies the data in place
+        self._persisted = set()
+        self._pending = set()
+
+        checkpoints = list(ImportCheckpoint.objects.filter(league_id=league_id))
+        cutoff = timezone.now() - timedelta(seconds=max_age)
+        if any(checkpoint.created < cutoff for checkpoint in checkpoints):
+            ImportCheckpoint.objects.filter(league_id=league_id).delete()
+            checkpoints = []
+        for checkpoint in checkpoints:
+            if checkpoint.persisted:
+                self._persisted.add(checkpoint.stage)
+            else:
+                self._payloads[checkpoint.stage] = checkpoint.payload
+        self.resumed = bool(checkpoints)
+        self._stored = self.resumed
+
+    def persisted(self, stage: str) -> bool:
+        return stage in self._persisted
+
+    # payload is a list of each call's data, calls are only made if the stage has not been fetched before
+    def fetch(self, stage: str, *calls: Callable) -> list:
+        if stage in self._payloads:
+            return json.loads(self._payloads[stage])
+        payload = []
+        successful = True
+        for call in calls:
+            payload.append(call())
+            successful = successful and self._api.last_call_successful
+        if successful:
+            self._payloads[stage] = json.dumps(payload)
+        return payload
+
+    # yields (week, stage, data) for every week of resource that has not been persisted,
+    # iter_weeks is one of SleeperAPI's iter_season_* methods
+    def fetch_weeks(self, resource: str, iter_weeks: Callable[..., Iterator[tuple]]) -> Iterator[tuple]:
+        stages = {stage for stage in [*self._payloads, *self._persisted] if stage.startswith(f'{resource}/')}
+        for stage in stages - self._persisted:
+            yield int(stage.split('/')[1]), stage, json.loads(self._payloads[stage])[0]
+        for week, data, successful in iter_weeks(skip_weeks={int(stage.split('/')[1]) for stage in stages}):
+            stage = f'{resource}/{week}'
+            if successful:
+                self._payloads[stage] = json.dumps([data])
+            yield week, stage, data
+
+    # a stage is pending from when its objects are handed to the BulkWriter until the writer flushes them
+    def pending(self, stage: str) -> None:
+        self._pending.add(stage)
+
+    def flushed(self, successful: bool) -> None:
+        if successful:
+            # only stages that were fetched successfully can be skipped next time
+            persisted = {stage for stage in self._pending if stage in self._payloads}
+            self._persisted |= persisted
+            for stage in persisted:
+                del self._payloads[stage]
+        self._pending = set()
+
+    def save(self) -> None:
+        checkpoints = [
+            ImportCheckpoint(league_id=self.league_id, stage=stage, payload=None, persisted=True) for stage in self._persisted
+        ]
+        checkpoints += [
+            ImportCheckpoint(league_id=self.league_id, stage=stage, payload=payload) for stage, payload in self._payloads.items()
+        ]
+        ImportCheckpoint.objects.bulk_create(
+            checkpoints,
+            update_conflicts=True,
+            unique_fields=['league_id', 'stage'],
+            update_fields=['payload', 'persisted'],
+        )
+        self._stored = True
+
+    def clear(self) -> None:
+        if self._stored:
+            ImportCheckpoint.objects.filter(league_id=self.league_id).delete()
+            self._stored = False
@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from leagues.models import League
+from main.models import CrawlClaim, SleeperUser
+
+
+class CrawlFrontier():
+    # Leases SleeperUsers to one crawl worker at a time, least recently crawled first. Leases are taken with
+    # a conditional UPDATE so concurrent workers never get the same user, and a lease left by a crashed
+    # worker expires after lease_seconds so another worker can take the user.
+    def __init__(self, worker_id: str, lease_seconds: int) -> None:
+        self.worker_id = worker_id
+        self._lease = timedelta(seconds=lease_seconds)
+
+    def _available(self) -> Q:
+        return Q(lease_expires__isnull=True) | Q(lease_expires__lt=timezone.now())
+
+    def claim(self, count: int, attempts: int=3) -> 'list[SleeperUser]':
+        claimed_ids = set()
+        for _ in range(attempts):
+            missing = count - len(claimed_ids)
+            candidates = SleeperUser.objects.filter(self._available()).order_by('last_crawled')
+            candidate_ids = list(candidates.values_list('user_id', flat=True)[:missing])
+            if not candidate_ids:
+                break
+            # users leased by another worker since the select above no longer match and are skipped
+            SleeperUser.objects.filter(self._available(), pk__in=candidate_ids).update(
+                lease_owner=self.worker_id, lease_expires=timezone.now() + self._lease
+            )
+            claimed_ids.update(SleeperUser.objects.filter(pk__in=candidate_ids, lease_owner=self.worker_id).values_list('user_id', flat=True))
+            if len(claimed_ids) >= count:
+                break
+        return list(SleeperUser.objects.filter(pk__in=claimed_ids).order_by('last_crawled'))
+
+    def renew(self) -> None:
+        SleeperUser.objects.filter(lease_owner=self.worker_id).update(lease_expires=timezone.now() + self._lease)
+
+    def release(self) -> None:
+        SleeperUser.objects.filter(lease_owner=self.worker_id).update(lease_owner=None, lease_expires=None)
+
+
+# the current season is crawled every time, past seasons only until they have been fetched once
+def seasons_to_crawl(user: SleeperUser, seasons: list) -> list:
+    current_season = seasons[-1]
+    return [season for season in seasons if season == current_season or season not in user.seasons_crawled]
+
+
+def record_crawled_seasons(user: SleeperUser, seasons: list, fetched_seasons: list) -> None:
+    past_seasons = seasons[:-1]
+    user.seasons_crawled = sorted(set(user.seasons_crawled) | (set(fetched_seasons) & set(past_seasons)))
+    user.all_seasons_crawled = set(past_seasons) <= set(user.seasons_crawled)
+
+
+class KnownLeagues():
+    # Which leagues are stored and whether their last import succeeded, loaded with one pk__in query
+    # per batch and kept in memory for the rest of the run
+    def __init__(self) -> None:
+        self._import_successful = {}  # None for leagues that are not stored
+
+    def load(self, league_ids: list) -> None:
+        unknown_ids = [league_id for league_id in league_ids if league_id not in self._import_successful]
+        if not unknown_ids:
+            return
+        self._import_successful.update(dict.fromkeys(unknown_ids))
+        leagues = League.objects.filter(pk__in=unknown_ids).values_list('league_id', 'last_import_successful')
+        self._import_successful.update(leagues)
+
+    def add(self, league_id: str, import_successful: bool) -> None:
+        self._import_successful[league_id] = import_successful
+
+    def exists(self, league_id: str) -> bool:
+        return self._import_successful.get(league_id) is not None
+
+    def imported(self, league_id: str) -> bool:
+        return self._import_successful.get(league_id) is True
+
+
+class ClaimedLeagues():
+    # League IDs claimed during one crawl run. Claims live in the database so every chunk of the run,
+    # on any worker, agrees on which chunk handles a league.
+    def __init__(self, run_id: str, worker_id: str) -> None:
+        self.run_id = run_id
+        self.worker_id = worker_id
+
+    # returns the subset of league_ids claimed by this worker, including ones it claimed before
+    def claim(self, league_ids: list) -> set:
+        CrawlClaim.objects.bulk_create(
+            [CrawlClaim(run_id=self.run_id, league_id=league_id, claimed_by=self.worker_id) for league_id in league_ids],
+            ignore_conflicts=True,
+        )
+        claimed = CrawlClaim.objects.filter(run_id=self.run_id, league_id__in=league_ids, claimed_by=self.worker_id)
+        return set(claimed.values_list('league_id', flat=True))
+
+    @staticmethod
+    def release_run(run_id: str) -> None:
+        CrawlClaim.objects.filter(run_id=run_id).delete()
+
+    # claims of runs whose aggregate_crawl never ran, because a chunk raised or a worker died
+    @staticmethod
+    def expire(max_age: int) -> int:
+        deleted, _ = CrawlClaim.objects.filter(created__lt=timezone.now() - timedelta(seconds=max_age)).delete()
+        return deleted
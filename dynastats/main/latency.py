@@ -0,0 +1,34 @@
+from collections import deque
+from math import ceil
+from threading import Lock
+
+
+class LatencyTracker():
+    # Keeps the last window response times of every endpoint so hedging thresholds follow the API's current
+    # speed. Percentiles are only reported once an endpoint has min_samples measurements.
+    def __init__(self, window: int=200, min_samples: int=20) -> None:
+        self._window = window
+        self._min_samples = min_samples
+        self._samples = {}
+        self._lock = Lock()
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self._window)).append(seconds)
+
+    def percentile(self, endpoint: str, percentile: float) -> float:
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < self._min_samples:
+            return None
+        return samples[max(ceil(percentile / 100 * len(samples)) - 1, 0)]
+
+    def stats(self) -> dict:
+        return {
+            endpoint: {'count': len(self._samples[endpoint]), 'p50': self.percentile(endpoint, 50), 'p95': self.percentile(endpoint, 95)}
+            for endpoint in list(self._samples)
+        }
+
+
+# shared by every SleeperAPI in the process
+latency_tracker = LatencyTracker()
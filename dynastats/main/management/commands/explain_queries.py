@@ -0,0 +1,111 @@
+import json
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.utils import timezone
+
+from leagues.models import League
+from main.models import Player, SleeperUser
+from main.search import PlayerIndex
+from matchups.models import Matchup
+from rosters.models import Pick
+from transactions.models import Trade, Waiver
+
+
+# the queries run most often by the import, crawl and retry tasks and by the views, the filter values do not
+# need to exist since only the plans are compared
+def hot_queries() -> dict:
+    now = timezone.now()
+    return {
+        'crawl_claim': SleeperUser.objects.filter(
+            Q(lease_expires__isnull=True) | Q(lease_expires__lt=now)
+        ).order_by('last_crawled').values_list('user_id', flat=True)[:25],
+        'crawl_leased': SleeperUser.objects.filter(lease_owner='worker').values_list('user_id', flat=True),
+        'retry_due': League.objects.filter(
+            Q(next_retry_at__isnull=True) | Q(next_retry_at__lte=now), last_import_successful=False
+        ).values_list('league_id', flat=True),
+        'top_level_leagues': League.objects.filter(following_league=None),
+        'league_week_matchups': Matchup.objects.filter(league_id='0', week=1),
+        'league_leg_trades': Trade.objects.filter(league_id='0', leg=1),
+        'league_leg_waivers': Waiver.objects.filter(league_id='0', leg=1),
+        'recent_trades': Trade.objects.order_by('-created')[:50],
+        'draft_round_picks': Pick.objects.filter(draft_id='0', round=1),
+        'player_index_build': Player.objects.using(DEFAULT_DB_ALIAS).values(*PlayerIndex._fields),
+        'player_index_patch': Player.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=['0']).values(*PlayerIndex._fields),
+    }
+
+
+# drops what changes between runs without the plan changing, sqlite node ids and postgres cost estimates
+def normalize(plan: str) -> 'list[str]':
+    lines = []
+    for line in plan.splitlines():
+        line = re.sub(r'^\d+ \d+ \d+ ', '', line.strip())
+        line = re.sub(r'\s*\((cost|actual time)=[^)]*\)', '', line)
+        lines.append(line)
+    return lines
+
+
+# tables read in full, sqlite reports them as SCAN without an index, postgres as Seq Scan
+def full_scans(plan: 'list[str]') -> set:
+    scans = set()
+    for line in plan:
+        match = re.match(r'SCAN (\w+)', line) or re.search(r'Seq Scan on (\w+)', line)
+        if match and 'USING' not in line:
+            scans.add(match.group(1))
+    return scans
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs EXPLAIN on the hot queries of the import, crawl and retry tasks and the views and compares the plans '
+        'with a saved baseline. Fails when a query starts reading a whole table it did not read before.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=Path(settings.BASE_DIR) / 'query_plans.json')
+        parser.add_argument('--save', action='store_true', help='save the current plans as the baseline')
+        parser.add_argument('--verbose-plans', action='store_true', help='print every plan')
+
+    def handle(self, *args, **options):
+        plans = {name: normalize(queryset.explain()) for name, queryset in hot_queries().items()}
+        baseline_path = Path(options['baseline'])
+
+        if options['verbose_plans']:
+            for name, plan in plans.items():
+                self.stdout.write(name)
+                self.stdout.write('\n'.join(f'  {line}' for line in plan))
+
+        if options['save']:
+            with open(baseline_path, 'w') as f:
+                json.dump(plans, f, indent=2)
+            self.stdout.write(f'Saved {len(plans)} plans to {baseline_path}')
+            return
+
+        if not baseline_path.exists():
+            raise CommandError(f'No baseline at {baseline_path}, run with --save first')
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        regressions = []
+        for name, plan in plans.items():
+            if name not in baseline:
+                self.stdout.write(f'{name}: not in the baseline')
+                continue
+            if plan == baseline[name]:
+                continue
+            new_scans = full_scans(plan) - full_scans(baseline[name])
+            if new_scans:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: now scans {", ".join(sorted(new_scans))}'))
+            else:
+                self.stdout.write(self.style.WARNING(f'{name}: plan changed'))
+            self.stdout.write('\n'.join(f'  - {line}' for line in baseline[name]))
+            self.stdout.write('\n'.join(f'  + {line}' for line in plan))
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} query plan regressions: {", ".join(regressions)}')
+        self.stdout.write(f'{len(plans)} query plans checked, no regressions')
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.archive import PayloadArchive
+from main.utils import ArchiveAPI, Formatter, UserResolver
+from tasks.tasks import import_league_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-imports leagues from the raw payload archive without calling the Sleeper API. '
+        'Players are not archived, run update_players first if the player table is empty.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('league_ids', nargs='*', help='leagues to re-import, every archived league if omitted')
+        parser.add_argument('--archive', default=settings.SLEEPER_ARCHIVE_PATH, help='archive directory')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if not options['archive']:
+            raise CommandError('No archive path given and SLEEPER_ARCHIVE_PATH is not set')
+        archive = PayloadArchive(options['archive'])
+        api = ArchiveAPI(archive)
+        formatter = Formatter()
+        resolver = UserResolver(api)
+
+        league_ids = options['league_ids']
+        if not league_ids:
+            league_ids = sorted({record['url'].rsplit('/', 1)[-1] for record in archive.iter_records('league')})
+        
+        failed = []
+        for league_id in league_ids:
+            league_data = api.get_league(league_id)
+            if not league_data:
+                failed.append(league_id)
+                continue
+            result = import_league_data(league_data, api, formatter, resolver, options['batch_size'])
+            if not result['successful']:
+                failed.append(league_id)
+            self.stdout.write(f"{league_id}: {result['objects_saved']} objects saved")
+
+        self.stdout.write(f'Replayed {len(league_ids) - len(failed)} of {len(league_ids)} leagues')
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Failed: {", ".join(failed)}'))
@@ -0,0 +1,39 @@
+from time import sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.utils import OperationalError
+
+from main.persistence import QueueConsumer, WriteQueue
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the single database writer for PERSISTENCE_MODE=queue, committing the batches workers queue in '
+        'PERSISTENCE_QUEUE_PATH. Only one writer may run at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='exit once the queue is empty')
+        parser.add_argument('--poll', type=float, default=1, help='seconds to wait when the queue is empty')
+        parser.add_argument('--max-objects', type=int, default=settings.PERSISTENCE_WRITER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        consumer = QueueConsumer(WriteQueue(settings.PERSISTENCE_QUEUE_PATH), max_objects=options['max_objects'])
+        consumer.configure_connection()
+        applied = 0
+        while True:
+            try:
+                count = consumer.run_once()
+            except OperationalError as e:
+                # the batch stays queued and is retried, another process may be holding the database
+                self.stderr.write(f'Write failed, retrying: {e}')
+                sleep(options['poll'])
+                continue
+            applied += count
+            if count:
+                continue
+            if options['once']:
+                break
+            sleep(options['poll'])
+        self.stdout.write(f'Applied {applied} queued messages')
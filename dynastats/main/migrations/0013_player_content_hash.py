@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_ratelimitbucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='content_hash',
+            field=models.CharField(max_length=40, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_player_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlClaim',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(max_length=64)),
+                ('league_id', models.CharField(max_length=80)),
+                ('claimed_by', models.CharField(max_length=64)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('run_id', 'league_id'), name='unique_crawl_claim')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_crawlclaim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sleeperuser',
+            name='lease_expires',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='sleeperuser',
+            name='lease_owner',
+            field=models.CharField(max_length=128, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_sleeperuser_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sleeperuser',
+            name='seasons_crawled',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1 on 2026-10-18 19:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_sleeperuser_seasons_crawled'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sleeperuser',
+            index=models.Index(fields=['last_crawled'], name='sleeperuser_last_crawled'),
+        ),
+        migrations.AddIndex(
+            model_name='sleeperuser',
+            index=models.Index(fields=['lease_owner'], name='sleeperuser_lease_owner'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_sleeperuser_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='crawlclaim',
+            name='claimed_by',
+            field=models.CharField(max_length=128),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.1 on 2026-10-18 19:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_crawlclaim_claimed_by_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawlclaim',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
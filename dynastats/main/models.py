@@ -12,7 +12,16 @@ class SleeperUser(models.Model):
     avatar = models.CharField(max_length=64, null=True)
     site_user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True)
     all_seasons_crawled = models.BooleanField(default=False)
+    seasons_crawled = models.JSONField(default=list)  # past seasons whose leagues have been fetched
     last_crawled = models.DateTimeField(default=make_aware(datetime(1970, 1, 1)))
+    lease_owner = models.CharField(max_length=128, null=True)  # crawl worker currently holding the user
+    lease_expires = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_crawled'], name='sleeperuser_last_crawled'),
+            models.Index(fields=['lease_owner'], name='sleeperuser_lease_owner'),
+        ]
 
 
 class Player(models.Model):
@@ -36,6 +45,25 @@ class Player(models.Model):
     weight = models.CharField(max_length=4, null=True)
     height = models.CharField(max_length=16, null=True)
     college = models.CharField(max_length=32, null=True)
+    content_hash = models.CharField(max_length=40, null=True)  # sha1 of the fields above as last received from the API
 
     def __str__(self):
         return f'{self.player_id}: {self.full_name}'
+
+
+class RateLimitBucket(models.Model):
+    name = models.CharField(max_length=64, primary_key=True)
+    tokens = models.FloatField()
+    updated = models.FloatField()  # unix timestamp of the last refill
+
+
+class CrawlClaim(models.Model):
+    run_id = models.CharField(max_length=64)
+    league_id = models.CharField(max_length=80)
+    claimed_by = models.CharField(max_length=128)  # lease_owner of the worker
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['run_id', 'league_id'], name='unique_crawl_claim'),
+        ]
@@ -0,0 +1,367 @@
+import json
+import logging
+import os
+from functools import lru_cache
+from itertools import count
+from pathlib import Path
+from time import time_ns
+from typing import Callable
+
+from django.conf import settings
+from django.core.serializers import deserialize
+from django.core.serializers.base import DeserializedObject
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.utils import IntegrityError, OperationalError
+from django.utils import timezone
+
+from leagues.models import League
+from main.search import player_index
+
+
+persistence_logger = logging.getLogger(__name__)
+
+
+# number of foreign key and many-to-many hops to the models a model depends on, self references are ignored
+@lru_cache(maxsize=None)
+def dependency_depth(Model: models.Model) -> int:
+    related_fields = [field for field in Model._meta.concrete_fields if field.is_relation]
+    related_fields += Model._meta.local_many_to_many
+    related_models = {field.related_model for field in related_fields} - {Model}
+    return max((dependency_depth(related_model) + 1 for related_model in related_models), default=0)
+
+
+class M2MWriter():
+    # Brings the through tables of a whole batch of objects in line with their many-to-many data using a few
+    # set based queries, instead of one clear() and add() per field per object. Only missing rows are inserted
+    # and only stale rows are deleted.
+    def __init__(self, lookup_batch_size: int=500) -> None:
+        self._lookup_batch_size = lookup_batch_size
+
+    # m2m_data maps field names to {pk: [related pks]}, objects without a field's data are left untouched
+    def write(self, Model: models.Model, m2m_data: dict) -> None:
+        for field in Model._meta.local_many_to_many:
+            values_by_pk = m2m_data.get(field.name)
+            if values_by_pk:
+                self._write_field(field, values_by_pk)
+
+    def _write_field(self, field: models.ManyToManyField, values_by_pk: dict) -> None:
+        Through = field.remote_field.through
+        source = Through._meta.get_field(field.m2m_field_name()).attname
+        target = Through._meta.get_field(field.m2m_reverse_field_name()).attname
+
+        desired = {(pk, value) for pk, values in values_by_pk.items() for value in values}
+        existing = {}
+        pks = list(values_by_pk)
+        for i in range(0, len(pks), self._lookup_batch_size):
+            rows = Through.objects.filter(**{f'{source}__in': pks[i:i + self._lookup_batch_size]})
+            for row_id, source_pk, target_pk in rows.values_list('pk', source, target):
+                existing[(source_pk, target_pk)] = row_id
+
+        stale_ids = [row_id for row, row_id in existing.items() if row not in desired]
+        for i in range(0, len(stale_ids), self._lookup_batch_size):
+            Through.objects.filter(pk__in=stale_ids[i:i + self._lookup_batch_size]).delete()
+        Through.objects.bulk_create([
+            Through(**{source: source_pk, target: target_pk}) for source_pk, target_pk in desired - existing.keys()
+        ])
+
+
+class BulkWriter():
+    # Persists formatted objects (see main.utils.Formatter) with one upsert per model instead of a save() per object.
+    # Models are written in dependency order, so a batch may mix objects with the objects they reference.
+    # Objects can be written at once with write() or buffered with add() and written every batch_size objects,
+    # on_flush is called after every flush with whether all of the flushed objects were saved.
+    _lookup_batch_size = 500
+
+    def __init__(
+        self, logger: logging.Logger=persistence_logger, batch_size: int=None, on_flush: Callable[[bool], None]=None
+    ) -> None:
+        self._logger = logger
+        self._m2m_writer = M2MWriter()
+        self._batch_size = batch_size
+        self._on_flush = on_flush
+        self._buffer = []
+        self.error_flag = False
+        self.written = 0
+
+    def add(self, formatted_data: list) -> None:
+        self._buffer += formatted_data
+        if self._batch_size and len(self._buffer) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        buffer, self._buffer = self._buffer, []
+        error_flag, self.error_flag = self.error_flag, False
+        try:
+            if buffer:
+                self.write(buffer)
+            successful = not self.error_flag
+        finally:
+            self.error_flag = self.error_flag or error_flag
+        if self._on_flush is not None:
+            self._on_flush(successful)
+
+    # tells the search indexes of every process to patch in the players, once their rows are saved
+    def mark_players_changed(self, player_ids: list) -> None:
+        player_index.mark_changed(player_ids)
+
+    # objects of a league are only counted as imported once they are all saved
+    def mark_imported(self, league_id: str) -> None:
+        League.objects.filter(pk=league_id).update(
+            last_import_successful=True, import_attempts=0, last_import_error=None, next_retry_at=None,
+            last_updated=timezone.now(),
+        )
+
+    def write(self, formatted_data: list) -> None:
+        groups, fields = self._group(formatted_data)
+        with transaction.atomic():
+            for Model in sorted(groups, key=dependency_depth):
+                self._write_group(Model, list(groups[Model].values()), fields[Model])
+        self.written += len(formatted_data)
+
+    # also returns the fields the data carries for each model, only those are updated on existing rows so columns
+    # the API does not send, like the crawl bookkeeping of SleeperUser, keep their values
+    def _group(self, formatted_data: list) -> 'tuple[dict]':
+        groups = {}
+        fields = {}
+        for formatted_object in formatted_data:
+            # one at a time, objects of unknown models are skipped and could not be paired with their data otherwise
+            for deserialized_object in deserialize('python', [formatted_object], ignorenonexistent=True):
+                obj = deserialized_object.object
+                groups.setdefault(type(obj), {})[obj.pk] = deserialized_object  # last one wins, like repeated saves
+                fields.setdefault(type(obj), set()).update(formatted_object['fields'])
+        return groups, fields
+
+    # Foreign keys are only checked when the transaction commits, so the rows the objects reference are looked up
+    # before writing them, a constraint check after the insert would scan the whole tables. Returns the references
+    # to missing rows of every object that has some, by pk.
+    def _missing_references(self, Model: models.Model, deserialized_objects: 'list[DeserializedObject]') -> dict:
+        references = {}
+        for deserialized_object in deserialized_objects:
+            obj = deserialized_object.object
+            for field in Model._meta.concrete_fields:
+                if field.is_relation and field.db_constraint and getattr(obj, field.attname) is not None:
+                    references.setdefault(field, {}).setdefault(getattr(obj, field.attname), []).append(obj.pk)
+            for field_name, values in (deserialized_object.m2m_data or {}).items():
+                field = Model._meta.get_field(field_name)
+                for value in values:
+                    references.setdefault(field, {}).setdefault(value, []).append(obj.pk)
+
+        pks = {deserialized_object.object.pk for deserialized_object in deserialized_objects}
+        missing = {}
+        for field, referencing_pks in references.items():
+            RelatedModel = field.related_model
+            target = field.target_field.attname if field.many_to_one or field.one_to_one else RelatedModel._meta.pk.attname
+            values = list(referencing_pks.keys() - (pks if RelatedModel is Model else set()))
+            existing = set()
+            for i in range(0, len(values), self._lookup_batch_size):
+                rows = RelatedModel._base_manager.filter(**{f'{target}__in': values[i:i + self._lookup_batch_size]})
+                existing.update(rows.values_list(target, flat=True))
+            for value in set(values) - existing:
+                for pk in referencing_pks[value]:
+                    missing.setdefault(pk, []).append(f'{field.name}={value}')
+        return missing
+
+    def _write_group(self, Model: models.Model, deserialized_objects: 'list[DeserializedObject]', fields: set) -> None:
+        pk_name = Model._meta.pk.name
+        update_fields = [field.name for field in Model._meta.concrete_fields if not field.primary_key and field.name in fields]
+        missing = self._missing_references(Model, deserialized_objects)
+        for deserialized_object in deserialized_objects:
+            if deserialized_object.object.pk in missing:
+                references = ', '.join(missing[deserialized_object.object.pk])
+                self._logger.critical(f'FOREIGN KEY constraint failed: {references} | {vars(deserialized_object.object)}')
+                self.error_flag = True
+        deserialized_objects = [
+            deserialized_object for deserialized_object in deserialized_objects if deserialized_object.object.pk not in missing
+        ]
+        if not deserialized_objects:
+            return
+        try:
+            with transaction.atomic():
+                Model.objects.bulk_create(
+                    [deserialized_object.object for deserialized_object in deserialized_objects],
+                    update_conflicts=bool(update_fields),
+                    ignore_conflicts=not update_fields,
+                    unique_fields=[pk_name] if update_fields else None,
+                    update_fields=update_fields or None,
+                )
+                m2m_data = {}
+                for deserialized_object in deserialized_objects:
+                    for field_name, values in (deserialized_object.m2m_data or {}).items():
+                        m2m_data.setdefault(field_name, {})[deserialized_object.object.pk] = values
+                self._m2m_writer.write(Model, m2m_data)
+        except IntegrityError:
+            for deserialized_object in deserialized_objects:
+                self._save(deserialized_object, update_fields)
+
+    def _save(self, deserialized_object: DeserializedObject, update_fields: list) -> None:
+        obj = deserialized_object.object
+        try:
+            with transaction.atomic():
+                # existing rows only get the fields of the data, like the bulk upsert
+                if update_fields and type(obj).objects.filter(pk=obj.pk).exists():
+                    obj.save(update_fields=update_fields)
+                    for field_name, values in (deserialized_object.m2m_data or {}).items():
+                        getattr(obj, field_name).set(values)
+                else:
+                    deserialized_object.save()
+        except IntegrityError as e:
+            # Do more research to determine if more specific messaging is possible
+            self._logger.critical(f'{e} | {vars(deserialized_object.object)}')
+            self.error_flag = True
+
+
+class WriteQueue():
+    # Local spool directory of write messages, one JSON file each. Files are written under a temporary name and
+    # renamed into place so the writer never reads a partial message, names sort in the order they were queued.
+    _counter = count()
+
+    def __init__(self, path: str) -> None:
+        self._path = Path(path)
+        self._path.mkdir(parents=True, exist_ok=True)
+
+    def put(self, message: dict) -> None:
+        name = f'{time_ns():020d}-{os.getpid()}-{next(self._counter):08d}'
+        temporary_path = self._path / f'{name}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(message, f, cls=DjangoJSONEncoder)
+        os.replace(temporary_path, self._path / f'{name}.json')
+
+    def pending(self) -> 'list[Path]':
+        return sorted(self._path.glob('*.json'))
+
+    def read(self, path: Path) -> dict:
+        with open(path) as f:
+            return json.load(f)
+
+    def remove(self, paths: 'list[Path]') -> None:
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    # moves a message that can not be applied out of the way, to failed/ next to the error it raised
+    def fail(self, path: Path, error: str) -> Path:
+        failed_path = self._path / 'failed' / path.name
+        failed_path.parent.mkdir(exist_ok=True)
+        os.replace(path, failed_path)
+        failed_path.with_suffix('.error').write_text(error)
+        return failed_path
+
+
+class QueuedWriter(BulkWriter):
+    # BulkWriter for PERSISTENCE_MODE 'queue', hands batches to the single writer process (see
+    # main/management/commands/run_writer.py) instead of writing them. A flush succeeds once the batch is queued,
+    # errors while saving are reported on the league by the writer.
+    def __init__(
+        self, queue: WriteQueue, league_id: str=None, logger: logging.Logger=persistence_logger, batch_size: int=None,
+        on_flush: Callable[[bool], None]=None
+    ) -> None:
+        super().__init__(logger, batch_size, on_flush)
+        self._queue = queue
+        self._league_id = league_id
+
+    def mark_players_changed(self, player_ids: list) -> None:
+        self._queue.put({'op': 'mark_players_changed', 'league_id': None, 'player_ids': player_ids})
+
+    def mark_imported(self, league_id: str) -> None:
+        self._queue.put({'op': 'mark_imported', 'league_id': league_id})
+
+    def write(self, formatted_data: list) -> None:
+        self._queue.put({'op': 'write', 'league_id': self._league_id, 'objects': formatted_data})
+        self.written += len(formatted_data)
+
+
+def get_writer(
+    logger: logging.Logger=persistence_logger, batch_size: int=None, on_flush: Callable[[bool], None]=None,
+    league_id: str=None
+) -> BulkWriter:
+    if settings.PERSISTENCE_MODE == 'queue':
+        return QueuedWriter(WriteQueue(settings.PERSISTENCE_QUEUE_PATH), league_id, logger, batch_size, on_flush)
+    return BulkWriter(logger, batch_size, on_flush)
+
+
+class QueueConsumer():
+    # The single writer of PERSISTENCE_MODE 'queue'. Applies queued messages in order, as many as add up to
+    # max_objects objects per transaction. Files are removed after their transaction commits, a crash in between
+    # only replays upserts.
+    def __init__(self, queue: WriteQueue, logger: logging.Logger=persistence_logger, max_objects: int=5000) -> None:
+        self._queue = queue
+        self._logger = logger
+        self._max_objects = max_objects
+        self._writer = BulkWriter(logger)
+        self._failed_leagues = set()  # leagues with objects that could not be saved since they were last marked
+
+    def configure_connection(self) -> None:
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+                cursor.execute('PRAGMA synchronous=NORMAL')
+
+    def _apply(self, message: dict) -> None:
+        league_id = message['league_id']
+        if message['op'] == 'write':
+            self._writer.error_flag = False
+            self._writer.write(message['objects'])
+            if self._writer.error_flag and league_id is not None:
+                self._failed_leagues.add(league_id)
+        elif message['op'] == 'mark_players_changed':
+            player_ids = message['player_ids']
+            transaction.on_commit(lambda: self._writer.mark_players_changed(player_ids))
+        elif league_id in self._failed_leagues:
+            self._failed_leagues.discard(league_id)
+            League.objects.filter(pk=league_id).update(last_import_error='Some objects could not be saved, see the writer log')
+        else:
+            self._writer.mark_imported(league_id)
+
+    # returns the number of messages applied
+    def run_once(self) -> int:
+        paths = []
+        batch = []
+        objects = 0
+        for path in self._queue.pending():
+            message = self._queue.read(path)
+            paths.append(path)
+            batch.append(message)
+            objects += len(message.get('objects', ()))
+            if objects >= self._max_objects:
+                break
+        if not batch:
+            return 0
+
+        failed_leagues = set(self._failed_leagues)
+        try:
+            with transaction.atomic():
+                for message in batch:
+                    self._apply(message)
+        except OperationalError:
+            self._failed_leagues = failed_leagues
+            raise
+        except Exception:
+            # one of the messages can not be applied, they are applied one at a time to set it aside
+            self._failed_leagues = failed_leagues
+            for path, message in zip(paths, batch):
+                self._apply_one(path, message)
+            return len(batch)
+        self._queue.remove(paths)
+        return len(batch)
+
+    def _apply_one(self, path: Path, message: dict) -> None:
+        failed_leagues = set(self._failed_leagues)
+        try:
+            with transaction.atomic():
+                self._apply(message)
+        except OperationalError:
+            self._failed_leagues = failed_leagues
+            raise
+        except Exception as e:
+            self._failed_leagues = failed_leagues
+            failed_path = self._queue.fail(path, repr(e))
+            self._logger.exception(f'Queued message could not be applied, moved to {failed_path}')
+            league_id = message.get('league_id')
+            if league_id is not None:
+                # the league is reported as failed even when its mark_imported message comes later
+                self._failed_leagues.add(league_id)
+                League.objects.filter(pk=league_id).update(
+                    last_import_successful=False, last_import_error=f'Queued write failed, see {failed_path}'
+                )
+        else:
+            self._queue.remove([path])
@@ -0,0 +1,42 @@
+from math import ceil, log2
+
+from rosters.models import Draft
+
+
+class LeaguePlan():
+    # Works out which calls import_league needs for a league from its settings and status instead of fetching
+    # every week of the season. season_weeks is the week count of the league's season according to the NFL
+    # state, it caps the plan since weeks that have not been played yet have nothing to fetch.
+    _draft_fields = tuple(field.name for field in Draft._meta.fields)
+
+    def __init__(self, league_data: dict, season_weeks: int) -> None:
+        league_settings = league_data.get('settings') or {}
+        status = league_data.get('status')
+        if status in ('pre_draft', 'drafting'):
+            # no games yet, offseason transactions are filed under week 1
+            self.transaction_weeks = min(1, season_weeks)
+            self.matchup_weeks = 0
+        else:
+            last_week = self._last_week(league_settings)
+            if status == 'complete' and league_settings.get('last_scored_leg'):
+                last_week = league_settings['last_scored_leg']
+            self.transaction_weeks = self.matchup_weeks = min(last_week or season_weeks, season_weeks)
+        self.calls = 2 + self.transaction_weeks + self.matchup_weeks + 1  # users, rosters, weeks, drafts listing
+
+    # last week of the playoffs, None when the league has no playoff settings
+    def _last_week(self, league_settings: dict) -> int:
+        playoff_week_start = league_settings.get('playoff_week_start')
+        if not playoff_week_start:
+            return None
+        playoff_teams = league_settings.get('playoff_teams') or 2
+        rounds = max(ceil(log2(playoff_teams)), 1)
+        round_type = league_settings.get('playoff_round_type') or 0
+        playoff_weeks = {0: rounds, 1: rounds + 1, 2: rounds * 2}.get(round_type, rounds)  # 1: two week final, 2: two week rounds
+        return playoff_week_start + playoff_weeks - 1
+
+    # returns whether the draft's own endpoint has to be called, the /drafts listing may already hold everything
+    # it returns. The picks always need their own call.
+    def plan_draft(self, draft: dict) -> bool:
+        needed = any(field not in draft for field in self._draft_fields)
+        self.calls += 2 if needed else 1
+        return needed
@@ -0,0 +1,110 @@
+import fcntl
+from pathlib import Path
+from threading import Lock
+from time import sleep, time
+
+from django.db.models import F, Value
+from django.db.models.functions import Least
+
+from main.models import RateLimitBucket
+
+
+class TokenBucket():
+    # Process-local bucket, also serves as the stand-in for DatabaseTokenBucket when no shared store is wanted
+    def __init__(self, capacity: int, refill_rate: float) -> None:
+        self.capacity = capacity
+        self.refill_rate = refill_rate  # tokens per second
+        self._tokens = float(capacity)
+        self._updated = time()
+        self._lock = Lock()
+
+    def _refilled(self, tokens: float, updated: float, now: float) -> float:
+        return min(self.capacity, tokens + (now - updated) * self.refill_rate)
+
+    def _wait_time(self, available: float, tokens: int) -> float:
+        return max(tokens - available, 0) / self.refill_rate
+
+    # returns 0 if the tokens were taken, otherwise the seconds to wait before trying again
+    def try_acquire(self, tokens: int=1) -> float:
+        with self._lock:
+            now = time()
+            available = self._refilled(self._tokens, self._updated, now)
+            self._updated = now
+            if available >= tokens:
+                self._tokens = available - tokens
+                return 0
+            self._tokens = available
+            return self._wait_time(available, tokens)
+
+    def acquire(self, tokens: int=1) -> None:
+        while tokens > 0:
+            chunk = min(tokens, self.capacity)
+            wait = self.try_acquire(chunk)
+            if wait:
+                sleep(wait)
+            else:
+                tokens -= chunk
+
+    def remaining(self) -> float:
+        with self._lock:
+            return self._refilled(self._tokens, self._updated, time())
+
+
+class DatabaseTokenBucket(TokenBucket):
+    # Bucket state lives in a RateLimitBucket row so every worker sharing the database shares the budget.
+    # Tokens are taken with a single conditional UPDATE, no row locks are needed. SleeperAPI only uses it on server
+    # databases, on sqlite every take would compete with the imports for the write lock.
+    def __init__(self, name: str, capacity: int, refill_rate: float) -> None:
+        super().__init__(capacity, refill_rate)
+        self.name = name
+        RateLimitBucket.objects.get_or_create(pk=name, defaults={'tokens': capacity, 'updated': time()})
+
+    def try_acquire(self, tokens: int=1) -> float:
+        now = time()
+        refilled = Least(Value(float(self.capacity)), F('tokens') + (Value(now) - F('updated')) * self.refill_rate)
+        taken = (
+            RateLimitBucket.objects
+            .filter(pk=self.name)
+            .alias(available=refilled)
+            .filter(available__gte=tokens)
+            .update(tokens=refilled - tokens, updated=now)
+        )
+        if taken:
+            return 0
+        return self._wait_time(self.remaining(), tokens)
+
+    def remaining(self) -> float:
+        bucket = RateLimitBucket.objects.get(pk=self.name)
+        return self._refilled(bucket.tokens, bucket.updated, time())
+
+
+class FileTokenBucket(TokenBucket):
+    # Bucket state lives in a small file taken with an exclusive flock, so every worker of the host shares the budget
+    # without writing to the database. Used with PERSISTENCE_MODE 'queue' where run_writer is the only writer.
+    def __init__(self, path: str, capacity: int, refill_rate: float) -> None:
+        super().__init__(capacity, refill_rate)
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _read(self, f) -> 'tuple[float]':
+        f.seek(0)
+        content = f.read().split()
+        if len(content) != 2:
+            return float(self.capacity), time()
+        return float(content[0]), float(content[1])
+
+    def try_acquire(self, tokens: int=1) -> float:
+        with self._lock, open(self._path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            now = time()
+            available = self._refilled(*self._read(f), now)
+            taken = available >= tokens
+            f.seek(0)
+            f.truncate()
+            f.write(f'{available - tokens if taken else available} {now}')
+        return 0 if taken else self._wait_time(available, tokens)
+
+    def remaining(self) -> float:
+        with self._lock, open(self._path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            return self._refilled(*self._read(f), time())
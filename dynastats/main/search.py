@@ -0,0 +1,201 @@
+import json
+import os
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import lru_cache
+from heapq import nsmallest
+from pathlib import Path
+from threading import Lock
+from time import time_ns
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from main.models import Player
+
+
+# same form as the search_* fields of the API, lowercase letters and digits only
+def normalize(text: str) -> str:
+    return ''.join(character for character in text.lower() if character.isalnum())
+
+
+# padded like pg_trgm so the start and the end of a name weigh more than its middle, cached for the indexed names
+@lru_cache(maxsize=65536)
+def trigrams(name: str) -> frozenset:
+    padded = f'  {name} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class PlayerIndex():
+    # In-memory index of player names for the search suggestions. The search_full_name and search_last_name
+    # of every player are kept in a sorted list of (name, player_id) so the names starting with a prefix are a
+    # bisect away, and in an inverted index of their trigrams for typo tolerant matching. The index is built on
+    # first use, update_players writes the ids it changed to a stamp file and every process patches those players
+    # in on its next search.
+    _fields = ('player_id', 'full_name', 'search_full_name', 'search_last_name', 'status', 'team', 'depth_chart_order')
+
+    def __init__(self, stamp_path: str, short_prefix: int=3, min_similarity: float=0.3) -> None:
+        self._stamp_path = Path(stamp_path)
+        self._short_prefix = short_prefix
+        self._min_similarity = min_similarity
+        self._lock = Lock()
+        # (players by id, sorted names, names by trigram, results of short prefixes), replaced as a whole so searches
+        # never see half a patch. Prefixes shorter than short_prefix match thousands of names, their results are kept.
+        self._state = None
+        self._stamp = None
+        self._stamp_mtime = None
+
+    # called by update_players, player_ids None makes every process rebuild its index
+    def mark_changed(self, player_ids: list=None) -> None:
+        stamp = self._read_stamp()
+        message = {'stamp': time_ns(), 'previous': stamp and stamp['stamp'], 'changed': player_ids}
+        temporary_path = self._stamp_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(temporary_path, 'w') as f:
+            json.dump(message, f)
+        os.replace(temporary_path, self._stamp_path)
+
+    def _read_stamp(self) -> dict:
+        try:
+            with open(self._stamp_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    # players are read from the primary, a lagging replica could leave the index behind until the next update
+    def _load(self, player_ids: list=None) -> list:
+        players = Player.objects.using(DEFAULT_DB_ALIAS)
+        if player_ids is not None:
+            players = players.filter(pk__in=player_ids)
+        return list(players.values(*self._fields))
+
+    def _refresh(self) -> None:
+        try:
+            stamp_mtime = self._stamp_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            stamp_mtime = None
+        if self._state is not None and stamp_mtime == self._stamp_mtime:
+            return
+        with self._lock:
+            if self._state is not None and stamp_mtime == self._stamp_mtime:
+                return
+            stamp = self._read_stamp()
+            stamp_id = stamp and stamp['stamp']
+            if self._state is None or stamp is None or stamp['changed'] is None or stamp['previous'] != self._stamp:
+                self._state = self._build()
+            elif stamp_id != self._stamp:
+                self._state = self._patch(stamp['changed'])
+            self._stamp = stamp_id
+            self._stamp_mtime = stamp_mtime
+
+    def _build(self) -> tuple:
+        players = {player['player_id']: player for player in self._load()}
+        names = sorted((name, player_id) for player_id, player in players.items() for name in self._keys(player))
+        grams = {}
+        for name, player_id in names:
+            for gram in trigrams(name):
+                grams.setdefault(gram, set()).add((name, player_id))
+        return players, names, grams, {}
+
+    # postings are copied the first time a patch touches them, the ones searches may be reading stay as they are
+    def _patch(self, player_ids: list) -> tuple:
+        players, names, grams = dict(self._state[0]), list(self._state[1]), dict(self._state[2])
+        copied = set()
+        for player_id in player_ids:
+            player = players.pop(player_id, None)
+            if player is not None:
+                self._remove(names, grams, copied, player)
+        for player in self._load(player_ids):
+            players[player['player_id']] = player
+            self._add(names, grams, copied, player)
+        return players, names, {gram: keys for gram, keys in grams.items() if keys}, {}
+
+    def _keys(self, player: dict) -> set:
+        return {name for name in (player['search_full_name'], player['search_last_name']) if name}
+
+    def _postings(self, grams: dict, copied: set, gram: str) -> set:
+        if gram not in copied:
+            grams[gram] = set(grams.get(gram, ()))
+            copied.add(gram)
+        return grams[gram]
+
+    def _add(self, names: list, grams: dict, copied: set, player: dict) -> None:
+        for name in self._keys(player):
+            insort(names, (name, player['player_id']))
+            for gram in trigrams(name):
+                self._postings(grams, copied, gram).add((name, player['player_id']))
+
+    def _remove(self, names: list, grams: dict, copied: set, player: dict) -> None:
+        for name in self._keys(player):
+            i = bisect_left(names, (name, player['player_id']))
+            if i < len(names) and names[i] == (name, player['player_id']):
+                del names[i]
+            for gram in trigrams(name):
+                self._postings(grams, copied, gram).discard((name, player['player_id']))
+
+    # active players first, then starters before backups on the depth chart
+    def _rank(self, player: dict) -> tuple:
+        depth_chart_order = player['depth_chart_order']
+        return (player['status'] != 'Active', player['team'] is None, depth_chart_order or 99, player['full_name'])
+
+    def _prefix_ids(self, names: list, prefix: str) -> set:
+        player_ids = set()
+        for i in range(bisect_left(names, (prefix,)), len(names)):
+            name, player_id = names[i]
+            if not name.startswith(prefix):
+                break
+            player_ids.add(player_id)
+        return player_ids
+
+    # trigram similarity of the text to the player's closest name, for players above min_similarity
+    def _similar_ids(self, grams: dict, text: str) -> dict:
+        query = trigrams(text)
+        shared = Counter()
+        for gram in query:
+            shared.update(grams.get(gram, ()))
+        # a name sharing fewer trigrams can not reach min_similarity whatever its length
+        min_shared = self._min_similarity * len(query)
+        similarities = {}
+        for (name, player_id), count in shared.items():
+            if count < min_shared:
+                continue
+            similarity = count / (len(query) + len(trigrams(name)) - count)
+            if similarity >= self._min_similarity and similarity > similarities.get(player_id, 0):
+                similarities[player_id] = similarity
+        return similarities
+
+    # typo tolerant lookup, the closest names first and the usual ranking between equally close names
+    def fuzzy_search(self, text: str, limit: int=5) -> 'list[dict]':
+        self._refresh()
+        players, _, grams, _ = self._state
+        similarities = self._similar_ids(grams, normalize(text))
+        return nsmallest(
+            limit, (players[player_id] for player_id in similarities),
+            key=lambda player: (-similarities[player['player_id']], self._rank(player))
+        )
+
+    # returns player dicts with the fields in _fields, best match first. Names starting with the text come first,
+    # when there are fewer than limit of them the rest are filled with fuzzy matches.
+    def search(self, text: str, limit: int=5) -> 'list[dict]':
+        self._refresh()
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        players, names, grams, short_results = self._state
+        if (prefix, limit) in short_results:
+            return short_results[(prefix, limit)]
+
+        prefix_ids = self._prefix_ids(names, prefix)
+        results = nsmallest(limit, (players[player_id] for player_id in prefix_ids), key=self._rank)
+        if len(results) < limit and len(prefix) >= self._short_prefix:
+            similarities = self._similar_ids(grams, prefix)
+            results += nsmallest(
+                limit - len(results), (players[player_id] for player_id in similarities.keys() - prefix_ids),
+                key=lambda player: (-similarities[player['player_id']], self._rank(player))
+            )
+        if len(prefix) < self._short_prefix:
+            short_results[(prefix, limit)] = results
+        return results
+
+
+# one index per process, shared by every request it serves
+player_index = PlayerIndex(settings.PLAYER_INDEX_STAMP_PATH)
@@ -1,3 +1,33 @@
-from django.test import TestCase
+import json
+import random
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from main.utils import iter_json_object
+
+
+class IterJsonObjectTests(SimpleTestCase):
+    document = json.dumps({
+        'a': 1e5, 'b': -2.5E-3, 'c': 10, 'd': -0.75, 'e': 3e+21, 'f': 'text', 'g': [1.5, {'h': None}],
+        'i': True, 'j': False, 'k': 'ünïcode', 'l': {'m': 12.25e2},
+    }).encode('utf-8')
+
+    def parse(self, chunks: list) -> dict:
+        return dict(iter_json_object(chunks))
+
+    def test_number_split_after_exponent(self):
+        self.assertEqual(self.parse([b'{"a": 1e', b'5}']), {'a': 1e5})
+        self.assertEqual(self.parse([b'{"a": 1.', b'5, "b": 2e-', b'3}']), {'a': 1.5, 'b': 2e-3})
+
+    def test_every_chunk_boundary(self):
+        expected = json.loads(self.document)
+        for i in range(1, len(self.document)):
+            self.assertEqual(self.parse([self.document[:i], self.document[i:]]), expected, i)
+
+    def test_random_chunks(self):
+        expected = json.loads(self.document)
+        generator = random.Random(0)
+        for _ in range(200):
+            cuts = sorted(generator.sample(range(1, len(self.document)), 8))
+            chunks = [self.document[start:end] for start, end in zip([0] + cuts, cuts + [len(self.document)])]
+            self.assertEqual(self.parse(chunks), expected)
@@ -1,41 +1,204 @@
+import codecs
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from hashlib import sha1
 from inspect import currentframe, getframeinfo
+import json
 import logging
+import os
 from datetime import datetime
 from json.decoder import JSONDecodeError
-from time import sleep
+from threading import Lock
+from math import ceil
+from time import monotonic, sleep
+from typing import Callable, Iterable, Iterator
 
+from django.conf import settings
 from django.utils.timezone import make_aware
-from django.db import models
-from requests import Response, Session
+from django.db import connection, models
+from requests import RequestException, Response, Session
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
+from main.archive import PayloadArchive, endpoint_name, process_archive
+from main.cache import ResponseCache
+from main.latency import latency_tracker
 from main.models import Player, SleeperUser
+from main.planner import LeaguePlan
+from main.ratelimit import DatabaseTokenBucket, FileTokenBucket, TokenBucket
 
 
 api_logger = logging.getLogger('api_logger')
 api_handler = logging.FileHandler('api.log')
 api_logger.addHandler(api_handler)
 
+
+# Yields the (key, value) pairs of a top level JSON object as soon as each value has been received,
+# so only the current chunk and the value being parsed are held in memory
+def iter_json_object(chunks: Iterable[bytes]) -> Iterator[tuple]:
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+
+    def fill() -> bool:
+        nonlocal buffer, position
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+        return True
+
+    def skip_whitespace() -> None:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer):
+                return
+            if not fill():
+                raise JSONDecodeError('Unexpected end of data', buffer, position)
+
+    def expect(characters: str) -> str:
+        nonlocal position
+        skip_whitespace()
+        character = buffer[position]
+        if character not in characters:
+            raise JSONDecodeError(f'Expecting one of {characters!r}', buffer, position)
+        position += 1
+        return character
+
+    def value():
+        nonlocal position
+        skip_whitespace()
+        while True:
+            try:
+                data, end = decoder.raw_decode(buffer, position)
+            except JSONDecodeError:
+                if fill():
+                    continue
+                raise
+            # a number at the end of the buffer may continue in the next chunk, raw_decode stops before a fraction
+            # or exponent that was cut off after its '.', 'e' or sign
+            if (
+                not isinstance(data, (dict, list, str)) and (end == len(buffer) or buffer[end] in '.eE+-') and fill()
+            ):
+                continue
+            position = end
+            return data
+
+    expect('{')
+    skip_whitespace()
+    if buffer[position] == '}':
+        return
+    while True:
+        key = value()
+        expect(':')
+        yield key, value()
+        if expect(',}') == '}':
+            return
+
+class NFLStateCache():
+    # /state/nfl shared by every SleeperAPI instance in the process, fetched lazily and kept for ttl seconds
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._state = None
+        self._fetched = 0
+
+    def get(self, fetch: Callable[[], dict], ttl: int) -> dict:
+        with self._lock:
+            if self._state is None or monotonic() - self._fetched > ttl:
+                self._state = fetch()
+                self._fetched = monotonic()
+            return self._state
+
+    # fetch is expected to skip the response cache, other callers keep the old state until it returns
+    def refresh(self, fetch: Callable[[], dict]) -> dict:
+        with self._lock:
+            self._state = fetch()
+            self._fetched = monotonic()
+            return self._state
+
+
+nfl_state_cache = NFLStateCache()
+
+
+class SessionRegistry():
+    # One pooled requests Session per worker process and retry policy, so keep-alive connections and TLS sessions
+    # outlive the task that opened them. Sessions are keyed by pid, a forked worker never uses its parent's sockets.
+    def __init__(self) -> None:
+        self._sessions = {}
+        self._lock = Lock()
+
+    def get(self, max_attempts: int, create: Callable[[int], Session]) -> Session:
+        key = (os.getpid(), max_attempts)
+        with self._lock:
+            if key not in self._sessions:
+                self._sessions = {k: session for k, session in self._sessions.items() if k[0] == key[0]}
+                self._sessions[key] = create(max_attempts)
+            return self._sessions[key]
+
+
+session_registry = SessionRegistry()
+
+
 class SleeperAPI():
     # https://docs.sleeper.app/
-    def __init__(self, max_attempts: int=3, throttle: int=0) -> None:    
-        self._session = self._create_session(max_attempts)
+    def __init__(
+        self, max_attempts: int=3, throttle: int=0, concurrency: int=1,
+        rate_limiter: TokenBucket=None, cache: ResponseCache=None, archive: PayloadArchive=None, hedge: bool=None
+    ) -> None:    
+        self._concurrency = max(concurrency, 1)
+        self._hedge = settings.SLEEPER_HEDGE_REQUESTS if hedge is None else hedge
+        self._hedge_executor = ThreadPoolExecutor(max_workers=2 * self._concurrency) if self._hedge else None
+        self._hedge_allowance = 0  # tokens already taken from the rate limiter for hedges sent by worker threads
+        self._session = session_registry.get(max_attempts, self._create_session)
         self._throttle = throttle
+        if rate_limiter is None and (settings.PERSISTENCE_MODE == 'queue' or connection.vendor == 'sqlite'):
+            # run_writer is the only process writing to the database in queue mode and an update per request would
+            # lock sqlite against the imports, the workers of the host share a file instead
+            rate_limiter = FileTokenBucket(
+                settings.SLEEPER_RATE_BUCKET_PATH, settings.SLEEPER_RATE_BURST, settings.SLEEPER_RATE_LIMIT / 60
+            )
+        elif rate_limiter is None:
+            rate_limiter = DatabaseTokenBucket('sleeper', settings.SLEEPER_RATE_BURST, settings.SLEEPER_RATE_LIMIT / 60)
+        self._rate_limiter = rate_limiter
+        if cache is None and settings.SLEEPER_CACHE_PATH:
+            cache = ResponseCache(settings.SLEEPER_CACHE_PATH, settings.SLEEPER_CACHE_MAX_SIZE)
+        self.cache = cache
+        if archive is None and settings.SLEEPER_ARCHIVE_PATH:
+            archive = process_archive(settings.SLEEPER_ARCHIVE_PATH)
+        self.archive = archive
+        self._lock = Lock()
         self.call_count = 0
+        self.hedge_count = 0
         self.error_flag = False
         self.last_call_successful = True
-        
-        self._nfl_state = self.get_nfl_state()
+        self.last_error = None
 
 
     _base = 'https://api.sleeper.app/v1'
 
+    @property
+    def _nfl_state(self) -> dict:
+        return nfl_state_cache.get(self.get_nfl_state, settings.SLEEPER_NFL_STATE_TTL)
+
+    def refresh_nfl_state(self) -> dict:
+        return nfl_state_cache.refresh(lambda: self.get_nfl_state(fresh=True))
+
+    @property
+    def tokens_remaining(self) -> float:
+        return self._rate_limiter.remaining()
+
     def _create_session(self, max_attempts: int) -> Session:
         status_forcelist = frozenset({429, 500, 503, 522})
         retry = Retry(total=max_attempts, status_forcelist=status_forcelist, raise_on_status=False)
         retry.RETRY_AFTER_STATUS_CODES = status_forcelist
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = HTTPAdapter(
+            max_retries=retry, pool_connections=settings.SLEEPER_POOL_CONNECTIONS, pool_maxsize=settings.SLEEPER_POOL_MAXSIZE
+        )
         session = Session()
         session.mount('https://', adapter)
         return session
@@ -44,6 +207,7 @@ class SleeperAPI():
         timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
         message = f'{timestamp} | URL: {url} | Status Code: {status_code}' 
         message += f' | {extra}' if extra else ''
+        self.last_error = message[len(timestamp) + 3:]
         api_logger.error(message, exc_info=exc_info)
 
     def _log_warning(self, url: str, status_code: int, extra: str='') -> None:
@@ -59,9 +223,64 @@ class SleeperAPI():
         message += f' | {extra}' if extra else ''
         api_logger.warning(message)
 
-    def _request(self, url: str) -> Response:
-        response = self._session.get(url)
-        self.call_count += 1 + len(response.raw.retries.history)
+    def _timeout(self, endpoint: str) -> tuple:
+        return settings.SLEEPER_CONNECT_TIMEOUT, settings.SLEEPER_ENDPOINT_TIMEOUTS.get(endpoint, settings.SLEEPER_READ_TIMEOUT)
+
+    def _get(self, url: str, endpoint: str, stream: bool=False) -> Response:
+        with self._lock:
+            self.call_count += 1  # counted when sent, a hedged request may still be waiting when its hedge returns
+        start = monotonic()
+        response = self._session.get(url, stream=stream, timeout=self._timeout(endpoint))
+        latency_tracker.record(endpoint, monotonic() - start)
+        with self._lock:
+            self.call_count += len(response.raw.retries.history)
+        return response
+
+    # hedges come out of the rate limiter directly when the caller takes its own tokens, worker threads of
+    # _fetch_many use the allowance taken for them up front instead
+    def _take_hedge_token(self, limit: bool) -> bool:
+        if limit:
+            return self._rate_limiter.try_acquire() == 0
+        with self._lock:
+            if self._hedge_allowance > 0:
+                self._hedge_allowance -= 1
+                return True
+        return False
+
+    # sends a duplicate request once the first one is slower than the endpoint's SLEEPER_HEDGE_PERCENTILE latency,
+    # whichever succeeds first is used
+    def _hedged_get(self, url: str, endpoint: str, limit: bool) -> Response:
+        threshold = latency_tracker.percentile(endpoint, settings.SLEEPER_HEDGE_PERCENTILE)
+        if threshold is None:
+            return self._get(url, endpoint)
+        first = self._hedge_executor.submit(self._get, url, endpoint)
+        try:
+            return first.result(timeout=threshold)
+        except FutureTimeoutError:
+            pass
+        if not self._take_hedge_token(limit):
+            return first.result()
+
+        with self._lock:
+            self.hedge_count += 1
+        pending = {first, self._hedge_executor.submit(self._get, url, endpoint)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in (done | pending) - {future}:
+                        other.add_done_callback(lambda f: f.exception() is None and f.result().close())
+                    return future.result()
+        return first.result()
+
+    def _request(self, url: str, limit: bool=True, stream: bool=False) -> Response:
+        if limit:
+            self._rate_limiter.acquire()
+        endpoint = endpoint_name(url)
+        if self._hedge and not stream:
+            response = self._hedged_get(url, endpoint, limit)
+        else:
+            response = self._get(url, endpoint, stream)
         if self._throttle:
             sleep(self._throttle)
         return response
@@ -69,34 +288,103 @@ class SleeperAPI():
     def _handle_response(self, response: Response) -> tuple:
         url = response.request.url
         status_code = response.status_code
+        successful = True
         if status_code != 200:
             self._log_error(url, status_code)
-            self.last_call_successful = False
-            self.error_flag = True
+            successful = False
             data = None
         else:
             try:
                 data = response.json()
             except JSONDecodeError:
                 self._log_error(url, status_code, exc_info=1)
-                self.last_call_successful = False
-                self.error_flag = True
+                successful = False
                 data = None
-        return data, url, status_code
+        if not successful:
+            self.error_flag = True
+        return data, url, status_code, successful
 
     def _handle_response_data(self, response_data: tuple, log_null: bool):
-        data, url, status_code = response_data
+        data, url, status_code, _ = response_data
         if not data and log_null:
             self._log_warning(url, status_code, 'Unexpected Null Response')
         return data
 
-    def _call(self, url: str, log_null: bool):
-        self.last_call_successful = True
-        response = self._request(url)
+    def _from_cache(self, url: str, log_null: bool, ttl: int) -> tuple:
+        if self.cache is None or ttl == ResponseCache.DISABLED:
+            return None
+        body = self.cache.get(url)
+        if body is None:
+            return None
+        response_data = (json.loads(body), url, 200, True)
+        return self._handle_response_data(response_data, log_null), True
+
+    def iter_players(self, chunk_size: int=64 * 1024) -> Iterator[dict]:
+        self._log_error(f'{self._base}/players/nfl', None, 'Players are not archived')
+        self.last_call_successful = False
+        self.error_flag = True
+        return iter(())
+
+    def _download(self, url: str, log_null: bool, ttl: int, limit: bool=True) -> tuple:
+        try:
+            response = self._request(url, limit)
+        except RequestException as e:
+            self._log_error(url, None, f'{type(e).__name__}: {e}')
+            self.error_flag = True
+            return None, False
         response_data = self._handle_response(response)
+        successful = response_data[3]
+        if successful and self.cache is not None and ttl != ResponseCache.DISABLED:
+            self.cache.set(url, response.content, ttl)
+        if successful and self.archive is not None:
+            self.archive.write(url, response.content)
         data = self._handle_response_data(response_data, log_null)
+        return data, successful
+
+    def _fetch(self, url: str, log_null: bool, ttl: int) -> tuple:
+        return self._from_cache(url, log_null, ttl) or self._download(url, log_null, ttl)
+
+    def _call(self, url: str, log_null: bool, ttl: int=ResponseCache.DISABLED):
+        data, self.last_call_successful = self._fetch(url, log_null, ttl)
         return data
 
+    # fetches urls concurrently up to self._concurrency, (data, successful) pairs are returned in the order of urls
+    # last_call_successful reflects the last url, same as calling them one after another
+    def _fetch_many(self, urls: list, log_null: bool, ttl: int=ResponseCache.DISABLED) -> 'list[tuple]':
+        if self._concurrency == 1 or len(urls) < 2:
+            results = [self._fetch(url, log_null, ttl) for url in urls]
+            if results:
+                self.last_call_successful = results[-1][1]
+            return results
+
+        results = {url: self._from_cache(url, log_null, ttl) for url in urls}
+        misses = [url for url, result in results.items() if result is None]
+        if misses:
+            # tokens are taken up front so worker threads never touch the rate limiter's database connection
+            tokens = len(misses)
+            if self._hedge:
+                hedge_tokens = max(ceil(tokens * (100 - settings.SLEEPER_HEDGE_PERCENTILE) / 100) - self._hedge_allowance, 0)
+                self._hedge_allowance += hedge_tokens
+                tokens += hedge_tokens
+            self._rate_limiter.acquire(tokens)
+            max_workers = min(self._concurrency, len(misses))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                downloads = executor.map(lambda url: self._download(url, log_null, ttl, limit=False), misses)
+                results.update(zip(misses, downloads))
+        self.last_call_successful = results[urls[-1]][1]
+        return [results[url] for url in urls]
+
+    def _call_many(self, urls: list, log_null: bool, ttl: int=ResponseCache.DISABLED) -> list:
+        return [data for data, _ in self._fetch_many(urls, log_null, ttl)]
+
+    # completed seasons never change, the current season is only cached briefly
+    def _cache_ttl(self, season: str) -> int:
+        if season is None:
+            return ResponseCache.DISABLED
+        if str(season) < self._nfl_state['league_season']:
+            return ResponseCache.FOREVER
+        return settings.SLEEPER_CACHE_TTL
+
     def _get_week_count(self, season: str) -> int:
         current_season = self._nfl_state['league_season']
         current_week = self._nfl_state['leg']
@@ -112,9 +400,16 @@ class SleeperAPI():
             week_count = 17 if season < '2021' else 18
         return week_count
 
-    def get_nfl_state(self) -> dict:
+    def plan_league(self, league_data: dict) -> LeaguePlan:
+        return LeaguePlan(league_data, self._get_week_count(league_data['season']))
+
+    # fresh downloads the state even if the response cache holds it, the new state is still cached
+    def get_nfl_state(self, fresh: bool=False) -> dict:
         url = f'{self._base}/state/nfl'
-        data = self._call(url, log_null=True)
+        if fresh:
+            data, self.last_call_successful = self._download(url, log_null=True, ttl=settings.SLEEPER_CACHE_STATE_TTL)
+        else:
+            data = self._call(url, log_null=True, ttl=settings.SLEEPER_CACHE_STATE_TTL)
         assert data and isinstance(data, dict)
         return data
 
@@ -142,14 +437,21 @@ class SleeperAPI():
         data = self._call(url, log_null=False)
         return data
 
-    def get_all_user_leagues(self, user_id: str) -> list:
+    def get_seasons(self) -> list:
         current_season = int(self._nfl_state['league_create_season'])
-        season = 2017  # Sleeper's first season
-        leagues_list = []
-        while season <= current_season:
-            data = self.get_user_leagues(user_id, season)
-            leagues_list += data or []
-            season += 1
+        return [str(season) for season in range(2017, current_season + 1)]  # 2017 is Sleeper's first season
+
+    # only seasons that were fetched successfully are included
+    def get_user_leagues_by_season(self, user_id: str, seasons: list) -> dict:
+        urls = [f'{self._base}/user/{user_id}/leagues/nfl/{season}' for season in seasons]
+        results = self._fetch_many(urls, log_null=False)
+        return {season: data or [] for season, (data, successful) in zip(seasons, results) if successful}
+
+    def get_all_user_leagues(self, user_id: str, seasons: list=None) -> list:
+        if seasons is None:
+            seasons = self.get_seasons()
+        leagues_by_season = self.get_user_leagues_by_season(user_id, seasons)
+        leagues_list = [league for leagues in leagues_by_season.values() for league in leagues]
         if not leagues_list:
             self._log_null([user_id], 'User has no leagues!')
         return leagues_list
@@ -169,47 +471,68 @@ class SleeperAPI():
         data = self._call(url, log_null=True)
         return data
 
-    def get_transactions(self, league_id: str, week: int) -> list:
+    def get_transactions(self, league_id: str, week: int, season: str=None) -> list:
         url = f'{self._base}/league/{league_id}/transactions/{week}'
-        data = self._call(url, log_null=False)
+        data = self._call(url, log_null=False, ttl=self._cache_ttl(season))
         return data
 
+    # yields (week, data, successful), fetching as many weeks at a time as requests run concurrently
+    # week_count defaults to every week of the season, see LeaguePlan for a league's exact count
+    def _iter_season_weeks(
+        self, league_id: str, season: str, resource: str, log_null: bool, skip_weeks: set=frozenset(),
+        week_count: int=None
+    ) -> Iterator[tuple]:
+        if week_count is None:
+            week_count = self._get_week_count(season)
+        weeks = [week for week in range(1, week_count + 1) if week not in skip_weeks]
+        for i in range(0, len(weeks), self._concurrency):
+            window = weeks[i:i + self._concurrency]
+            urls = [f'{self._base}/league/{league_id}/{resource}/{week}' for week in window]
+            results = self._fetch_many(urls, log_null, ttl=self._cache_ttl(season))
+            yield from ((week, data, successful) for week, (data, successful) in zip(window, results))
+
+    def iter_season_transactions(
+        self, league_id: str, season: str, skip_weeks: set=frozenset(), week_count: int=None
+    ) -> Iterator[tuple]:
+        return self._iter_season_weeks(league_id, season, 'transactions', False, skip_weeks, week_count)
+
     def get_season_transactions(self, league_id: str, season: str) -> list:
-        week_count = self._get_week_count(season)
         transactions_list = []                
-        for week in range(1, week_count + 1):
-            transactions = self.get_transactions(league_id, week)
+        for _, transactions, _ in self.iter_season_transactions(league_id, season):
             if transactions:
                 transactions_list += transactions
         return transactions_list
 
-    def get_matchups(self, league_id: str, week: int) -> list:
+    def get_matchups(self, league_id: str, week: int, season: str=None) -> list:
         url = f'{self._base}/league/{league_id}/matchups/{week}'
-        data = self._call(url, log_null=True)
+        data = self._call(url, log_null=True, ttl=self._cache_ttl(season))
         return data
 
+    def iter_season_matchups(
+        self, league_id: str, season: str, skip_weeks: set=frozenset(), week_count: int=None
+    ) -> Iterator[tuple]:
+        return self._iter_season_weeks(league_id, season, 'matchups', True, skip_weeks, week_count)
+
     def get_season_matchups(self, league_id: str, season: str) -> dict:
         matchups_dict = {}
-        week_count = self._get_week_count(season)
-        for week in range(1, week_count + 1):
-            matchups = self.get_matchups(league_id, week)
+        for week, matchups, _ in self.iter_season_matchups(league_id, season):
             if matchups:
                 matchups_dict[week] = matchups
         return matchups_dict
 
-    def get_drafts(self, league_id: str) -> list:
+    def get_drafts(self, league_id: str, season: str=None) -> list:
         url = f'{self._base}/league/{league_id}/drafts'
-        data = self._call(url, log_null=True)
+        data = self._call(url, log_null=True, ttl=self._cache_ttl(season))
         return data
 
-    def get_draft(self, draft_id: str) -> dict:
+    def get_draft(self, draft_id: str, season: str=None) -> dict:
         url = f'{self._base}/draft/{draft_id}'
-        data = self._call(url, log_null=True)
+        data = self._call(url, log_null=True, ttl=self._cache_ttl(season))
         return data
     
-    def get_draft_picks(self, draft_id: str) -> list:
+    def get_draft_picks(self, draft_id: str, season: str=None) -> list:
         url = f'{self._base}/draft/{draft_id}/picks'
-        data = self._call(url, log_null=True)
+        data = self._call(url, log_null=True, ttl=self._cache_ttl(season))
         return data
 
     def get_players(self) -> dict:
@@ -217,6 +540,77 @@ class SleeperAPI():
         data = self._call(url, log_null=True)
         return data
 
+    # streaming version of get_players, yields player dicts while the response is still being downloaded
+    def iter_players(self, chunk_size: int=64 * 1024) -> Iterator[dict]:
+        url = f'{self._base}/players/nfl'
+        self.last_call_successful = True
+        try:
+            response = self._request(url, stream=True)
+        except RequestException as e:
+            self._log_error(url, None, f'{type(e).__name__}: {e}')
+            self.last_call_successful = False
+            self.error_flag = True
+            return
+        with response:
+            if response.status_code != 200:
+                self._log_error(url, response.status_code)
+                self.last_call_successful = False
+                self.error_flag = True
+                return
+            try:
+                for _, player in iter_json_object(response.iter_content(chunk_size)):
+                    yield player
+            except (JSONDecodeError, RequestException):
+                self._log_error(url, response.status_code, exc_info=1)
+                self.last_call_successful = False
+                self.error_flag = True
+
+
+
+class ArchiveAPI(SleeperAPI):
+    # Serves every call from a PayloadArchive instead of the network, so imports can be replayed offline after
+    # Formatter or the models change. Urls that were never archived are logged and treated as failed calls.
+    # The streamed players dump is not archived, iter_players always fails.
+    def __init__(self, archive: PayloadArchive) -> None:
+        super().__init__(rate_limiter=TokenBucket(1, 1), archive=archive)
+        self.cache = None
+
+    def _download(self, url: str, log_null: bool, ttl: int, limit: bool=True) -> tuple:
+        body = self.archive.get(url)
+        if body is None:
+            self._log_error(url, None, 'Not in archive')
+            self.error_flag = True
+            return None, False
+        response_data = (json.loads(body), url, 200, True)
+        return self._handle_response_data(response_data, log_null), True
+
+    def iter_players(self, chunk_size: int=64 * 1024) -> Iterator[dict]:
+        self._log_error(f'{self._base}/players/nfl', None, 'Players are not archived')
+        self.last_call_successful = False
+        self.error_flag = True
+        return iter(())
+
+
+class UserResolver():
+    # Fetches users a league references (transaction creators, draft pickers) but does not list.
+    # Users already stored locally are skipped with one query, users fetched from the API and users found
+    # locally are remembered so a crawl run never looks up the same user twice.
+    def __init__(self, api: SleeperAPI) -> None:
+        self._api = api
+        self._fetched = {}
+        self._stored = set()
+
+    def resolve(self, user_ids: set) -> dict:
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        users_by_id = {user_id: self._fetched[user_id] for user_id in user_ids if user_id in self._fetched}
+        unknown_ids = user_ids - users_by_id.keys() - self._stored
+        if unknown_ids:
+            stored_ids = set(SleeperUser.objects.filter(pk__in=unknown_ids).values_list('pk', flat=True))
+            self._stored |= stored_ids
+            unknown_ids -= stored_ids
+        for user_id in unknown_ids:
+            users_by_id[user_id] = self._fetched[user_id] = self._api.get_user(user_id)
+        return users_by_id
 
 
 class Formatter():
@@ -225,9 +619,13 @@ class Formatter():
         self._sleeper_user_fields =  self._get_fields(SleeperUser)
 
     def _get_fields(self, Model: models.Model) -> tuple:
-        fields = (field.name for field in Model._meta.fields)
+        fields = tuple(field.name for field in Model._meta.fields)
         return fields
 
+    def _content_hash(self, data: dict, fields: tuple) -> str:
+        content = {field: data.get(field) for field in fields if field != 'content_hash'}
+        return sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
     def league(self, data: dict, users_list: list) -> dict:
         data['sleeper_users'] = users_list
         if data.get('previous_league_id') == '0':
@@ -397,6 +795,7 @@ class Formatter():
 
 
     def player(self, data: dict) -> dict:
+        data['content_hash'] = self._content_hash(data, self._player_fields)
         formatted_player = {
             'model': 'main.player',
             'pk': data['player_id'],
@@ -10,6 +10,7 @@ from django.views.generic import FormView, TemplateView, View
 
 from .forms import ImportForm
 from dynastats.celery import app
+from dynastats.routers import pin_to_primary
 from tasks.tasks import import_league_history
 # Create your views here.
 
@@ -72,6 +73,8 @@ class ImportState(LoginRequiredMixin, TemplateView):
             task = AsyncResult(task_id, app=app)
             state = task.state.title()
             message = self.message_map[state]
+            if state == 'Success':
+                pin_to_primary(request)
 
             context = {
                 'league_id': league_id,
@@ -98,6 +101,8 @@ class Components(LoginRequiredMixin, View):
             task = AsyncResult(task_id, app=app)
             state = task.state.title()
             message = ImportState.message_map[state]
+            if state == 'Success':
+                pin_to_primary(request)
             context = {
                 'import_state': state,
                 'message': message
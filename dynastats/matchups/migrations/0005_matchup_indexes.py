@@ -0,0 +1,20 @@
+# Generated by Django 4.1 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0013_league_indexes'),
+        ('main', '0017_sleeperuser_indexes'),
+        ('matchups', '0004_alter_matchup_opponent_matchup_id'),
+        ('rosters', '0013_pick_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matchup',
+            index=models.Index(fields=['league_id', 'week'], name='matchup_league_week'),
+        ),
+    ]
@@ -17,4 +17,9 @@ class Matchup(models.Model):
     players_points = models.JSONField()
     points = models.FloatField()
     custom_points = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['league_id', 'week'], name='matchup_league_week'),
+        ]
     
\ No newline at end of file
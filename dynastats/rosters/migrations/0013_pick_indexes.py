@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_sleeperuser_indexes'),
+        ('rosters', '0012_alter_pick_roster_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pick',
+            index=models.Index(fields=['draft_id', 'round'], name='pick_draft_round'),
+        ),
+    ]
@@ -40,4 +40,9 @@ class Pick(models.Model):
     pick_no = models.PositiveSmallIntegerField()
     metadata = models.JSONField(null=True)
     draft_slot = models.PositiveSmallIntegerField()
-    draft_id = models.ForeignKey(Draft, on_delete=models.CASCADE)
\ No newline at end of file
+    draft_id = models.ForeignKey(Draft, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['draft_id', 'round'], name='pick_draft_round'),
+        ]
@@ -1,33 +1,74 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import islice
+import tracemalloc
+from uuid import uuid4
 
+from celery import chord
+from celery.signals import task_postrun
 from celery.utils.log import get_task_logger
-from django.core.serializers import deserialize
-from django.db.utils import OperationalError, IntegrityError
-from django.db.models import QuerySet
+from django.conf import settings
+from django.db.utils import OperationalError
+from django.db.models import Q, QuerySet
+from django.utils import timezone
 from django.utils.timezone import make_aware
 
 from leagues.models import League
+from main.archive import flush_process_archives
+from main.checkpoint import LeagueCheckpoint
+from main.crawl import ClaimedLeagues, CrawlFrontier, KnownLeagues, record_crawled_seasons, seasons_to_crawl
 from main.models import Player, SleeperUser
-from main.utils import Formatter, SleeperAPI
+from main.persistence import BulkWriter, get_writer
+from main.planner import LeaguePlan
+from main.utils import Formatter, SleeperAPI, UserResolver
 from dynastats.celery import app
 
 logger = get_task_logger(__name__)
 
+
+# worker processes exit with os._exit, the responses a task archived are written out before the next task starts
+@task_postrun.connect
+def flush_archives(**kwargs) -> None:
+    flush_process_archives()
+
+def _update_player_batch(formatted_players: list, writer: BulkWriter, counts: dict, changed_ids: list) -> None:
+    # only players whose content hash changed since the last update are written
+    player_ids = [formatted_player['pk'] for formatted_player in formatted_players]
+    known_hashes = dict(Player.objects.filter(pk__in=player_ids).values_list('player_id', 'content_hash'))
+    new_players = []
+    changed_players = []
+    for formatted_player in formatted_players:
+        player_id = formatted_player['pk']
+        if player_id not in known_hashes:
+            new_players.append(formatted_player)
+        elif known_hashes[player_id] != formatted_player['fields']['content_hash']:
+            changed_players.append(formatted_player)
+    counts['inserted'] += len(new_players)
+    counts['updated'] += len(changed_players)
+    counts['unchanged'] += len(formatted_players) - len(new_players) - len(changed_players)
+    changed_ids += [formatted_player['pk'] for formatted_player in new_players + changed_players]
+    writer.write(new_players + changed_players)
+
+
 @app.task(autoretry_for=(OperationalError,), default_retry_delay=30)
-def update_players():
+def update_players(batch_size: int=None):
     formatter = Formatter()    
-    api = SleeperAPI()
+    api = SleeperAPI(concurrency=settings.SLEEPER_API_CONCURRENCY)
+    writer = get_writer(logger)
+    batch_size = batch_size or settings.PLAYERS_BATCH_SIZE
 
-    players = api.get_players()    
-    if players: 
-        logger.info('Player Data Fetched!')
-        formatted_players = [formatter.player(p) for p in players.values()]
-        logger.info('Player data formatted!')
-    else:
+    # players are formatted and saved in batches while the response streams in
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    changed_ids = []
+    formatted_players = (formatter.player(p) for p in api.iter_players())
+    while batch := list(islice(formatted_players, batch_size)):
+        _update_player_batch(batch, writer, counts, changed_ids)
+
+    if api.last_call_successful is False:
         logger.error('Player data could not be fetched, try again later.')
-    
-    for deserialized_player in deserialize('python', formatted_players, ignorenonexistent=True):
-        deserialized_player.save()
+        if not any(counts.values()):
+            return
+    logger.info(f"Players inserted: {counts['inserted']}, updated: {counts['updated']}, unchanged: {counts['unchanged']}")
         
     # Some player IDs are not valid players in the API response
     # Replacement players are added here for compatibility to ManytoMany relationships with players
@@ -58,184 +99,389 @@ def update_players():
             }
         },
     ]
-    for player in missing_players:
-        Player.objects.get_or_create(**player)
+    # only the ones not saved yet are written, through the writer like the players of the API
+    missing_ids = [player['pk'] for player in missing_players]
+    existing_ids = set(Player.objects.filter(pk__in=missing_ids).values_list('player_id', flat=True))
+    new_players = [
+        {'model': 'main.player', 'pk': player['pk'], 'fields': player['defaults']}
+        for player in missing_players if player['pk'] not in existing_ids
+    ]
+    if new_players:
+        writer.write(new_players)
+        changed_ids += [player['pk'] for player in new_players]
 
+    # search indexes of the web processes patch in the changed players
+    if changed_ids:
+        writer.mark_players_changed(changed_ids)
+    return counts
 
-@app.task(autoretry_for=(OperationalError,), default_retry_delay=30)
-def retry_league_import():
+
+@app.task
+def retry_league_import(concurrency: int=None) -> dict:
+    # coordinator, spreads the failed leagues that are due for a retry over at most concurrency subtasks
+    # leagues that keep failing are retried later and later, see _record_retry_failure
+    concurrency = concurrency or settings.RETRY_CONCURRENCY
+    now = timezone.now()
+    due = Q(next_retry_at__isnull=True) | Q(next_retry_at__lte=now)
+    leagues_to_retry: QuerySet[League] = League.objects.filter(due, last_import_successful=False)
+    league_ids = list(leagues_to_retry.order_by('import_attempts', 'league_id').values_list('league_id', flat=True))
+
+    # Dispatched leagues are not due again until the lease runs out, so a run started while this one is still
+    # working skips them. The subtasks set next_retry_at again once the league succeeds or fails. The lease end
+    # tells the leagues this run claimed apart from ones another run claimed first.
+    lease_end = now + timedelta(seconds=settings.RETRY_LEASE_SECONDS)
+    League.objects.filter(due, last_import_successful=False, pk__in=league_ids).update(next_retry_at=lease_end)
+    claimed_ids = set(League.objects.filter(pk__in=league_ids, next_retry_at=lease_end).values_list('league_id', flat=True))
+    league_ids = [league_id for league_id in league_ids if league_id in claimed_ids]
+    if not league_ids:
+        return {'leagues': 0, 'chunks': 0, 'result_id': None}
+
+    chunks = [league_ids[i::concurrency] for i in range(min(concurrency, len(league_ids)))]
+    logger.info(f'Retrying {len(league_ids)} leagues in {len(chunks)} chunks')
+    result = chord(retry_leagues.s(chunk) for chunk in chunks)(aggregate_retries.s())
+    return {'leagues': len(league_ids), 'chunks': len(chunks), 'result_id': result.id}
+
+
+@app.task
+def retry_leagues(league_ids: list) -> dict:
     formatter = Formatter()
-    api = SleeperAPI()
+    api = SleeperAPI(concurrency=settings.SLEEPER_API_CONCURRENCY)
+    resolver = UserResolver(api)
 
-    leagues_to_retry: QuerySet[League] = League.objects.filter(last_import_successful=False).order_by('league_id')
-    leagues_count = leagues_to_retry.count()
-    failed_leagues = []
-    for league in leagues_to_retry:
+    # attempts of the whole chunk in one query, only a successful import resets them (see BulkWriter.mark_imported)
+    attempts = dict(League.objects.filter(pk__in=league_ids).values_list('league_id', 'import_attempts'))
+    failed_leagues = {}
+    for league_id in league_ids:
         api.error_flag = False
-        league_data = api.get_league(league.league_id)
-        import_league(league_data, api, formatter)
-        if api.error_flag is True:
-            failed_leagues.append[league.league_id]
+        api.last_error = None
+        try:
+            league_data = api.get_league(league_id)
+            if not league_data:
+                error = api.last_error or 'League not found'
+            else:
+                error = import_league_data(league_data, api, formatter, resolver)['error']
+        except Exception as e:
+            logger.exception(f'Retry of {league_id} failed')
+            error = f'{type(e).__name__}: {e}'
+        if error is not None:
+            failed_leagues[league_id] = error
+            _record_retry_failure(league_id, attempts.get(league_id, 0) + 1, error)
+    return {'retried': len(league_ids), 'failed': failed_leagues}
+
+
+def _record_retry_failure(league_id: str, attempts: int, error: str) -> None:
+    backoff = min(settings.RETRY_BACKOFF_BASE * 2 ** (attempts - 1), settings.RETRY_BACKOFF_MAX)
+    League.objects.filter(pk=league_id).update(
+        import_attempts=attempts, last_import_error=error, next_retry_at=timezone.now() + timedelta(seconds=backoff)
+    )
+
+
+@app.task
+def aggregate_retries(results: list) -> str:
+    leagues_count = sum(result['retried'] for result in results)
+    failed_leagues = {league_id: error for result in results for league_id, error in result['failed'].items()}
     success_count = leagues_count - len(failed_leagues)
     return f'{success_count}/{leagues_count} retries successful. Failed leagues: {failed_leagues}'
 
 
-@app.task
-def crawl_leagues(num_users: int):
+@app.task(bind=True)
+def crawl_leagues(self, num_users: int, chunk_size: int=None) -> dict:
+    # coordinator, splits the users to crawl into chunks that run in parallel and aggregates their results
+    # each chunk leases its own users from the crawl frontier, so concurrent crawls never overlap
+    chunk_size = chunk_size or settings.CRAWL_CHUNK_SIZE
+    run_id = self.request.id or uuid4().hex
+    expired = ClaimedLeagues.expire(settings.CRAWL_CLAIM_MAX_AGE)
+    if expired:
+        logger.info(f'Removed {expired} league claims of unfinished crawl runs')
+
+    chunk_sizes = [min(chunk_size, num_users - i) for i in range(0, num_users, chunk_size)]
+    if not chunk_sizes:
+        return {'users': 0, 'chunks': 0, 'result_id': None}
+    logger.info(f'Crawling {num_users} users in {len(chunk_sizes)} chunks (run {run_id})')
+    result = chord(crawl_users.s(size, run_id) for size in chunk_sizes)(aggregate_crawl.s(run_id))
+    return {'users': num_users, 'chunks': len(chunk_sizes), 'result_id': result.id}
+
+
+@app.task(bind=True)
+def crawl_users(self, num_users: int, run_id: str) -> dict:
+    # fits lease_owner and claimed_by, the task id at the end keeps it unique when a long hostname is cut
+    worker_id = f'{self.request.hostname}:{self.request.id or uuid4().hex}'[-128:]
+    frontier = CrawlFrontier(worker_id, settings.CRAWL_LEASE_SECONDS)
+    sleeper_users = frontier.claim(num_users)
+    try:
+        return _crawl_users(sleeper_users, frontier, ClaimedLeagues(run_id, worker_id))
+    finally:
+        frontier.release()
+
+
+def _crawl_users(sleeper_users: 'list[SleeperUser]', frontier: CrawlFrontier, claimed_leagues: ClaimedLeagues) -> dict:
     formatter = Formatter()
-    api = SleeperAPI()
+    api = SleeperAPI(concurrency=settings.SLEEPER_API_CONCURRENCY)
+    resolver = UserResolver(api)
+    known_leagues = KnownLeagues()
     leagues_checked = set()
+    leagues_imported = 0
 
-    sleeper_users: QuerySet[SleeperUser] = SleeperUser.objects.order_by('last_crawled')[:num_users]
+    seasons = api.get_seasons()
     for i, user in enumerate(sleeper_users):
         user_id = user.user_id
-        user_leagues = api.get_all_user_leagues(user_id)
+        crawl_seasons = seasons_to_crawl(user, seasons)
+        leagues_by_season = api.get_user_leagues_by_season(user_id, crawl_seasons)
         
-        if api.last_call_successful is not True:
+        if not leagues_by_season:
             logger.warning(f'Sleeper API call failed for user {user_id}, skipping...')
             continue
+        if len(leagues_by_season) < len(crawl_seasons):
+            logger.warning(f'Sleeper API call failed for some seasons of user {user_id}, they will be retried next crawl')
+        record_crawled_seasons(user, seasons, list(leagues_by_season))
+        user_leagues = [league for leagues in leagues_by_season.values() for league in leagues]
         if not user_leagues:
+            user.save(update_fields=['seasons_crawled', 'all_seasons_crawled'])
             continue
 
-        logger.info(f'{len(user_leagues)} found for user {user_id} ({i + 1}/{num_users})')
+        logger.info(f'{len(user_leagues)} found for user {user_id} ({i + 1}/{len(sleeper_users)}), {api.tokens_remaining:.0f} API tokens left')
+        # leagues shared with users of other chunks are only handled by the chunk that claims them first
+        unchecked_ids = [league['league_id'] for league in user_leagues if league['league_id'] not in leagues_checked]
+        claimed_ids = claimed_leagues.claim(unchecked_ids) if unchecked_ids else set()
+        known_leagues.load(list(claimed_ids))
         for league_data in user_leagues:
             league_id = league_data['league_id']
-            if league_id in leagues_checked:
+            if league_id in leagues_checked or league_id not in claimed_ids:
                 continue
 
             if league_data['settings'].get('type') != 2:  # Not a dynasty league
-                num_new_users = import_users(league_id, api, formatter)
+                num_new_users = import_league_users(league_id, api, formatter)
                 logger.info(f'Skipping {league_id}, not a dynasty league. Found {num_new_users} new users.')
-            elif League.objects.filter(league_id=league_id).exists() is False:
-                import_league(league_data, api, formatter)
+            elif known_leagues.exists(league_id) is False:
+                successful = import_league_data(league_data, api, formatter, resolver)['successful']
+                known_leagues.add(league_id, successful)
+                if successful:
+                    leagues_imported += 1
             else:
                 logger.info(f'League {league_id} already imported, skipping...')
             
             leagues_checked.add(league_id)
         
         user.last_crawled = make_aware(datetime.utcnow())
-        user.save()
+        user.save(update_fields=['last_crawled', 'seasons_crawled', 'all_seasons_crawled'])
+        frontier.renew()
+
+    return {'users': len(sleeper_users), 'leagues_checked': len(leagues_checked), 'leagues_imported': leagues_imported}
+
+
+@app.task
+def aggregate_crawl(results: list, run_id: str) -> dict:
+    ClaimedLeagues.release_run(run_id)
+    totals = {'users': 0, 'leagues_checked': 0, 'leagues_imported': 0}
+    for result in results:
+        for key in totals:
+            totals[key] += result[key]
+    logger.info(f"Crawl {run_id} finished: {totals['users']} users, {totals['leagues_checked']} leagues checked, {totals['leagues_imported']} imported")
+    return totals
 
 
 @app.task(autoretry_for=(OperationalError,), default_retry_delay=30)
-def import_users(league_id: str, api: SleeperAPI, formatter: Formatter):
+def import_users(league_id: str) -> int:
+    api = SleeperAPI(concurrency=settings.SLEEPER_API_CONCURRENCY)
+    return import_league_users(league_id, api, Formatter())
+
+
+def import_league_users(league_id: str, api: SleeperAPI, formatter: Formatter) -> int:
     users_data = api.get_users(league_id) or []
-    num_new_users = 0
-    for user_data in users_data:
-        user_id = user_data['user_id']
-        defaults = {k: v for k,v in user_data.items() if k in formatter._sleeper_user_fields}
-        _, is_new_user = SleeperUser.objects.update_or_create(pk=user_id, defaults=defaults)  # refactor using transactions.atomic?
-        if is_new_user:
-            num_new_users += 1
-    
-    return num_new_users
+    user_ids = [user_data['user_id'] for user_data in users_data]
+    known_ids = set(SleeperUser.objects.filter(pk__in=user_ids).values_list('user_id', flat=True))
+    formatted_users = [
+        formatter.user({k: v for k, v in user_data.items() if k in formatter._sleeper_user_fields})
+        for user_data in users_data
+    ]
+    if formatted_users:
+        get_writer(logger).write(formatted_users)
+    return len(set(user_ids) - known_ids)
 
 
 @app.task(autoretry_for=(OperationalError,), default_retry_delay=30)
-def import_league_history(input_league_id: str, api: SleeperAPI=None, formatter: Formatter=None) -> str:
-    if api is None:
-        api = SleeperAPI()
-    if formatter is None:
-        formatter = Formatter()
+def import_league_history(input_league_id: str) -> str:
+    api = SleeperAPI(concurrency=settings.SLEEPER_API_CONCURRENCY)
+    formatter = Formatter()
+    resolver = UserResolver(api)
     
     leagues_data = api.get_league_history(input_league_id)[::-1]  # reverse list to start with first league
+    known_leagues = KnownLeagues()
+    known_leagues.load([league_data['league_id'] for league_data in leagues_data])
     for league_data in leagues_data:
         league_id = league_data['league_id']
-        league_exists = League.objects.filter(pk=league_id).exists()
-        if league_exists and League.objects.get(pk=league_id).last_import_successful:
+        if known_leagues.imported(league_id):
             logger.info(f'League {league_id} already imported, skipping...')
         else:
-            import_league(league_data, api, formatter)
+            import_league_data(league_data, api, formatter, resolver)
     return input_league_id
 
 
+def _import_league(
+    league_data: dict, api: SleeperAPI, formatter: Formatter, resolver: UserResolver, writer: BulkWriter,
+    checkpoint: LeagueCheckpoint
+) -> LeaguePlan:
+    league_id = league_data['league_id']
+    season = league_data['season']
+    plan = api.plan_league(league_data)
+
+    # league users, the league and its rosters come first, everything fetched later references them
+    resolved_user_ids = set()
+    if not checkpoint.persisted('league'):
+        users_data, rosters_data = checkpoint.fetch(
+            'league', lambda: api.get_users(league_id), lambda: api.get_rosters(league_id)
+        )
+        users_data = users_data or []
+        rosters_data = rosters_data or []
+        users_by_id = {user['user_id']: user for user in users_data}
+        resolved_user_ids.update(users_by_id)
+
+        formatted_league = formatter.league(league_data, list(users_by_id))
+        
+        rosters_by_owner = {}
+        orphan_rosters = []
+        for roster in rosters_data:
+            owner_id = roster['owner_id']
+            if owner_id is not None and owner_id not in rosters_by_owner:
+                rosters_by_owner[owner_id] = roster
+            else:
+                orphan_rosters.append(roster)
+        
+        formatted_rosters = []
+        formatted_users = []
+        users_and_rosters = [(rosters_by_owner[id], users_by_id.pop(id, None)) for id in rosters_by_owner]
+        for roster_data, user_data in users_and_rosters:
+            if not user_data:
+                formatted_roster = formatter.roster(roster_data)
+                formatted_rosters.append(formatted_roster)
+            else:
+                formatted_roster, formatted_user = formatter.roster_and_user(roster_data, user_data)
+                formatted_rosters.append(formatted_roster)
+                formatted_users.append(formatted_user)
+        formatted_rosters.extend([formatter.roster(roster) for roster in orphan_rosters])
+        formatted_users.extend([formatter.user(user) for user in users_by_id.values() if user])  # remaining users are co-owners or have no roster
+        checkpoint.pending('league')
+        writer.add([*formatted_users, formatted_league, *formatted_rosters])
+
+    # users referenced by transactions and picks but missing from the league are added along with them,
+    # in the same add() so a stage is never split across flushes
+    def add_with_users(stage: str, formatted_objects: list, user_ids: set) -> None:
+        referenced_users = resolver.resolve(user_ids - resolved_user_ids)
+        resolved_user_ids.update(referenced_users)
+        checkpoint.pending(stage)
+        writer.add([*[formatter.user(user) for user in referenced_users.values() if user], *formatted_objects])
+
+    iter_transactions = partial(api.iter_season_transactions, league_id, season, week_count=plan.transaction_weeks)
+    for _, stage, transactions in checkpoint.fetch_weeks('transactions', iter_transactions):
+        transactions = transactions or []
+        formatted_transactions = [formatter.transaction(transaction, league_id) for transaction in transactions]
+        add_with_users(stage, formatted_transactions, {transaction['creator'] for transaction in transactions})
+
+    iter_matchups = partial(api.iter_season_matchups, league_id, season, week_count=plan.matchup_weeks)
+    for week, stage, matchups in checkpoint.fetch_weeks('matchups', iter_matchups):
+        checkpoint.pending(stage)
+        writer.add(formatter.matchups(matchups, league_id, week) if matchups else [])
+
+    # the listing stays a fetched stage, each of its drafts is persisted as its own stage
+    drafts_data, = checkpoint.fetch('drafts', lambda: api.get_drafts(league_id, season))
+    for draft in drafts_data or []:
+        draft_id = draft['draft_id']
+        stage = f'draft/{draft_id}'
+        needs_detail = plan.plan_draft(draft)
+        if checkpoint.persisted(stage):
+            continue
+        if needs_detail:
+            detailed_draft, picks = checkpoint.fetch(
+                stage, lambda: api.get_draft(draft_id, season), lambda: api.get_draft_picks(draft_id, season)
+            )
+        else:
+            detailed_draft = draft
+            picks, = checkpoint.fetch(stage, lambda: api.get_draft_picks(draft_id, season))
+        picks = picks or []
+        formatted_draft = [formatter.draft(detailed_draft)] if detailed_draft else []
+        formatted_picks = [formatter.pick(pick, league_id) for pick in picks]
+        add_with_users(stage, [*formatted_draft, *formatted_picks], {pick['picked_by'] for pick in picks})
+
+    writer.flush()
+    return plan
+
+
+# takes only ids and json so it can be queued, league_data saves fetching the league when the caller has it
 @app.task(autoretry_for=(OperationalError,), default_retry_delay=30)
-def import_league(league_data: dict, api: SleeperAPI, formatter: Formatter):
+def import_league(league_id: str, league_data: dict=None, batch_size: int=None) -> dict:
+    api = SleeperAPI(concurrency=settings.SLEEPER_API_CONCURRENCY)
+    if league_data is None:
+        league_data = api.get_league(league_id)
+        if not league_data:
+            return {'league_id': league_id, 'successful': False, 'error': api.last_error or 'League not found'}
+    return import_league_data(league_data, api, Formatter(), batch_size=batch_size)
+
+
+# Resources are fetched, formatted and saved in batches of batch_size objects, in foreign key order,
+# so memory stays bounded no matter how much history a league has. Each batch is its own transaction,
+# last_import_successful is only set once every batch has been saved. A failed import leaves checkpoints the
+# next attempt resumes from, see main.checkpoint.LeagueCheckpoint.
+# Tasks that import many leagues call this directly to share one api and resolver between them.
+def import_league_data(
+    league_data: dict, api: SleeperAPI, formatter: Formatter, resolver: UserResolver=None, batch_size: int=None
+) -> dict:
+    if resolver is None:
+        resolver = UserResolver(api)
     api.error_flag = False
+    api.last_error = None
+    call_count = api.call_count
 
     league_id = league_data['league_id']
-    season = league_data['season']
     logger.info(f'Importing {league_id}')
-    
-    users_data = api.get_users(league_id) or []
-    users_by_id = {user['user_id']: user for user in users_data}
-    
-    formatted_league = formatter.league(league_data, list(users_by_id))
-    
-    formatted_transactions = []
-    transactions_data = api.get_season_transactions(league_id, season)
-    for transaction in transactions_data:
-        formatted_transactions.append(formatter.transaction(transaction, league_id))
-        creator_id = transaction['creator']
-        if creator_id not in users_by_id:
-            users_by_id[creator_id] = api.get_user(creator_id)
-
-    formatted_matchups = []
-    matchups_data = api.get_season_matchups(league_id, season)
-    for week, data in matchups_data.items():
-        formatted_matchups += formatter.matchups(data, league_id, week)
-
-    formatted_drafts = []
-    formatted_picks = []
-    drafts_data = api.get_drafts(league_id) or []
-    for draft in drafts_data:
-        draft_id = draft['draft_id']
-        detailed_draft = api.get_draft(draft_id)
-        if detailed_draft:
-            formatted_drafts.append(formatter.draft(detailed_draft))
-        
-        picks = api.get_draft_picks(draft_id) or []
-        for pick in picks:
-            formatted_picks.append(formatter.pick(pick, league_id))
-            picked_by_id = pick['picked_by']
-            if picked_by_id is not None and picked_by_id not in users_by_id:
-                users_by_id[picked_by_id] = api.get_user(picked_by_id)
-    
-    rosters_by_owner = {}
-    orphan_rosters = []
-    rosters_data = api.get_rosters(league_id) or []
-    for roster in rosters_data:
-        owner_id = roster['owner_id']
-        if owner_id is not None and owner_id not in rosters_by_owner:
-            rosters_by_owner[owner_id] = roster
-        else:
-            orphan_rosters.append(roster)
-    
-    formatted_rosters = []
-    formatted_users = []
-    users_and_rosters = [(rosters_by_owner[id], users_by_id.pop(id, None)) for id in rosters_by_owner]
-    for roster_data, user_data in users_and_rosters:
-        if not user_data:
-            formatted_roster = formatter.roster(roster_data)
-            formatted_rosters.append(formatted_roster)
-        else:
-            formatted_roster, formatted_user = formatter.roster_and_user(roster_data, user_data)
-            formatted_rosters.append(formatted_roster)
-            formatted_users.append(formatted_user)
-    formatted_rosters.extend([formatter.roster(roster) for roster in orphan_rosters])
-    formatted_users.extend([formatter.user(user) for user in users_by_id.values() if user])  # only remaining users left league or are co-owners
-
-    formatted_data = [
-        *formatted_users,
-        formatted_league,
-        *formatted_rosters,
-        *formatted_transactions,
-        *formatted_matchups,
-        *formatted_drafts,
-        *formatted_picks,
-    ]
-    
-    logger.info(f'API calls used: {api.call_count}')
-    logger.info(f'Data fetched and formatted, saving to database...')
-    for deserialized_object in deserialize('python', formatted_data, ignorenonexistent=True):
-        try:
-            deserialized_object.save()
-        except IntegrityError as e:
-            # Do more research to determine if more specific messaging is possible
-            logger.critical(f'{e} | {vars(deserialized_object.object)}')
-            api.error_flag = True
+
+    # tracing allocations makes the import several times slower, the peak memory is only measured on request
+    trace_memory = settings.IMPORT_TRACE_MEMORY
+    tracing = tracemalloc.is_tracing()
+    if trace_memory and not tracing:
+        tracemalloc.start()
+    if trace_memory:
+        start_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    peak_memory = None
+    checkpoint = LeagueCheckpoint(league_id, api, settings.IMPORT_CHECKPOINT_MAX_AGE)
+    if checkpoint.resumed:
+        logger.info(f'Resuming {league_id} from checkpoint')
+    writer = get_writer(logger, batch_size or settings.IMPORT_BATCH_SIZE, on_flush=checkpoint.flushed, league_id=league_id)
+    try:
+        plan = _import_league(league_data, api, formatter, resolver, writer, checkpoint)
+        if trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+    except Exception:
+        checkpoint.save()
+        raise
+    finally:
+        if trace_memory and not tracing:
+            tracemalloc.stop()
+
+    logger.info(f'API calls planned: {plan.calls}, used: {api.call_count - call_count}, objects saved: {writer.written}')
+    if peak_memory is not None:
+        logger.info(f'Peak memory: {peak_memory} bytes')
+    if api.cache is not None:
+        logger.info(f'Response cache hits: {api.cache.hits}, misses: {api.cache.misses}')
+    error = None
+    if writer.error_flag is True:
+        api.error_flag = True
+        error = 'Some objects could not be saved, see the task log'
+    elif api.error_flag is True:
+        error = api.last_error or 'Sleeper API call failed'
 
     if api.error_flag is False:
-        league: League = League.objects.get(pk=league_id)
-        league.last_import_successful = True
-        league.save()
+        writer.mark_imported(league_id)
+        checkpoint.clear()
+    else:
+        checkpoint.save()
+
+    return {
+        'league_id': league_id,
+        'api_calls': api.call_count - call_count,
+        'planned_calls': plan.calls,
+        'objects_saved': writer.written,
+        'peak_memory': peak_memory,
+        'successful': not api.error_flag,
+        'error': error,
+    }
@@ -0,0 +1,48 @@
+# Generated by Django 4.1 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leagues', '0013_league_indexes'),
+        ('main', '0017_sleeperuser_indexes'),
+        ('rosters', '0013_pick_indexes'),
+        ('transactions', '0012_alter_commissioner_creator_alter_freeagent_creator_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commissioner',
+            index=models.Index(fields=['league_id', 'leg'], name='commissioner_league_leg'),
+        ),
+        migrations.AddIndex(
+            model_name='commissioner',
+            index=models.Index(fields=['created'], name='commissioner_created'),
+        ),
+        migrations.AddIndex(
+            model_name='freeagent',
+            index=models.Index(fields=['league_id', 'leg'], name='freeagent_league_leg'),
+        ),
+        migrations.AddIndex(
+            model_name='freeagent',
+            index=models.Index(fields=['created'], name='freeagent_created'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['league_id', 'leg'], name='trade_league_leg'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['created'], name='trade_created'),
+        ),
+        migrations.AddIndex(
+            model_name='waiver',
+            index=models.Index(fields=['league_id', 'leg'], name='waiver_league_leg'),
+        ),
+        migrations.AddIndex(
+            model_name='waiver',
+            index=models.Index(fields=['created'], name='waiver_created'),
+        ),
+    ]
@@ -22,6 +22,10 @@ class Transaction(models.Model):
 
     class Meta:
         abstract = True
+        indexes = [
+            models.Index(fields=['league_id', 'leg'], name='%(class)s_league_leg'),
+            models.Index(fields=['created'], name='%(class)s_created'),
+        ]
 
 
 class Trade(Transaction):
@@ -1,13 +1,14 @@
-from django.db.models import Q
 from django.shortcuts import render
 from django.views.generic import View
 
 from .forms import TransactionQuery
 from .models import Trade, Waiver, FreeAgent
+from dynastats.routers import ReplicaReadMixin
 from main.models import Player
+from main.search import player_index
 # Create your views here.
 
-class TransactionExplorer(View):
+class TransactionExplorer(ReplicaReadMixin, View):
     template = 'transactions/explorer.html'
 
     def get(self, request):
@@ -15,7 +16,7 @@ class TransactionExplorer(View):
         return render(request, self.template, {'form': form, 'transactions': []})
 
 
-class Components(View):
+class Components(ReplicaReadMixin, View):
 
     def post(self, request, component):
         method = getattr(self, component)
@@ -29,12 +30,7 @@ class Components(View):
             'suggestions': []
         }
         if form.is_valid():
-            text_input = form.cleaned_data['player_name'].replace(' ', '').lower()
-            suggestions = Player.objects.filter(
-                Q(search_full_name__startswith=text_input) | 
-                Q(search_last_name__startswith=text_input)
-            )
-            context['suggestions'] = suggestions[:5]
+            context['suggestions'] = player_index.search(form.cleaned_data['player_name'])
         return render(request, template, context)   
 
 